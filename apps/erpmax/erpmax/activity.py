@@ -0,0 +1,168 @@
+# ERPMAX Activity Feed
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import add_days, cint, now, now_datetime
+
+from erpmax.utils import get_affected_rows
+
+
+DEFAULT_ACTIVITY_DOCTYPES = ("Sales Order", "Customer", "Item")
+
+# Entries kept per user (site config: erpmax_activity_feed_limit)
+DEFAULT_FEED_LIMIT = 200
+
+# Documents modified within this many days seed an empty feed
+BACKFILL_DAYS = 90
+
+
+def get_activity_doctypes():
+    """Get the doctypes recorded in the activity feed
+
+    Configurable with the `erpmax_activity_doctypes` site config list.
+    """
+    return frappe.conf.get("erpmax_activity_doctypes") or DEFAULT_ACTIVITY_DOCTYPES
+
+
+def get_feed_limit():
+    return cint(frappe.conf.get("erpmax_activity_feed_limit")) or DEFAULT_FEED_LIMIT
+
+
+def record_activity(doc, method=None):
+    """Document event hook appending the change to the owner's and editor's feed"""
+    if frappe.flags.in_install or frappe.flags.in_migrate or frappe.flags.in_patch:
+        return
+
+    if doc.doctype not in get_activity_doctypes():
+        return
+
+    modified_by = doc.modified_by or frappe.session.user
+    modified = doc.modified or now()
+    action = "created" if doc.flags.in_insert else "modified"
+
+    entries = [(modified_by, action)]
+    if doc.owner and doc.owner != modified_by:
+        entries.append((doc.owner, "modified"))
+
+    values = []
+    for user, entry_action in entries:
+        values.extend([user, doc.doctype, doc.name, entry_action, modified_by, modified])
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabERPMAX Activity Feed`
+            (`user`, `reference_doctype`, `reference_name`, `action`, `modified_by`, `modified`)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(entries))}
+    """, values)
+
+
+def remove_activity(doc, method=None):
+    """Document event hook dropping the feed entries of a deleted document"""
+    if doc.doctype not in get_activity_doctypes():
+        return
+
+    frappe.db.sql("""
+        DELETE FROM `tabERPMAX Activity Feed`
+        WHERE reference_doctype = %s
+        AND reference_name = %s
+    """, [doc.doctype, doc.name])
+
+
+def backfill_activity_feed():
+    """Seed an empty feed from recently modified documents
+
+    Runs once: the feed is only filled by document events, so without it
+    the feed would stay empty after installing or upgrading until
+    documents are saved again. Entries mirror `record_activity`, one for
+    the last editor and one for the owner. Returns the rows inserted.
+    """
+    if frappe.db.sql("SELECT 1 FROM `tabERPMAX Activity Feed` LIMIT 1"):
+        return 0
+
+    since = add_days(now_datetime(), -BACKFILL_DAYS)
+    inserted = 0
+
+    for doctype in get_activity_doctypes():
+        if not frappe.db.table_exists(doctype):
+            continue
+
+        for user_column, action, conditions in (
+            ("modified_by", "IF(creation = modified, 'created', 'modified')", "modified_by IS NOT NULL"),
+            ("owner", "'modified'", "owner IS NOT NULL AND owner != COALESCE(modified_by, '')")
+        ):
+            frappe.db.sql(f"""
+                INSERT INTO `tabERPMAX Activity Feed`
+                    (`user`, `reference_doctype`, `reference_name`, `action`, `modified_by`, `modified`)
+                SELECT `{user_column}`, %(doctype)s, name, {action}, modified_by, modified
+                FROM `tab{doctype}`
+                WHERE modified >= %(since)s
+                AND {conditions}
+            """, {"doctype": doctype, "since": since})
+            inserted += get_affected_rows()
+
+    frappe.db.commit()
+    trim_activity_feed()
+    return inserted
+
+
+def get_activity_feed(user, limit=10):
+    """Get the latest activity of a user, one entry per document
+
+    A single range read on the (user, modified) index; a few extra rows are
+    read so repeated saves of one document collapse into its latest entry.
+    """
+    rows = frappe.db.sql("""
+        SELECT reference_doctype, reference_name, action, modified_by, modified
+        FROM `tabERPMAX Activity Feed`
+        WHERE user = %(user)s
+        ORDER BY modified DESC
+        LIMIT %(limit)s
+    """, {"user": user, "limit": cint(limit) * 5}, as_dict=True)
+
+    seen = set()
+    feed = []
+    for row in rows:
+        key = (row.reference_doctype, row.reference_name)
+        if key in seen:
+            continue
+
+        seen.add(key)
+        feed.append(row)
+        if len(feed) >= cint(limit):
+            break
+
+    return feed
+
+
+def trim_activity_feed():
+    """Trim every user's feed to the configured number of entries"""
+    limit = get_feed_limit()
+    trimmed = 0
+
+    users = frappe.db.sql_list("""
+        SELECT user
+        FROM `tabERPMAX Activity Feed`
+        GROUP BY user
+        HAVING COUNT(*) > %s
+    """, [limit])
+
+    for user in users:
+        cutoff = frappe.db.sql("""
+            SELECT modified
+            FROM `tabERPMAX Activity Feed`
+            WHERE user = %s
+            ORDER BY modified DESC
+            LIMIT 1 OFFSET %s
+        """, [user, limit - 1])
+
+        if not cutoff:
+            continue
+
+        frappe.db.sql("""
+            DELETE FROM `tabERPMAX Activity Feed`
+            WHERE user = %s
+            AND modified < %s
+        """, [user, cutoff[0][0]])
+        trimmed += get_affected_rows()
+        frappe.db.commit()
+
+    return trimmed
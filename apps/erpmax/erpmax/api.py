@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import nowdate, now, get_url
 
+from erpmax import logs
+from erpmax.cache import clear_all as clear_erpmax_cache, get_generation
+from erpmax.queries import get_event_permissions
+
 
 @frappe.whitelist()
 def get_app_info():
@@ -19,44 +23,94 @@ def get_app_info():
     }
 
 
+# Company details per (site, company), valid while the "company" generation is unchanged
+_company_cache = {}
+
+
 @frappe.whitelist()
 def get_company_info():
-    """Get company information for templates"""
-    company = frappe.defaults.get_user_default("Company")
-    if not company:
-        company = frappe.get_all("Company", limit=1)
-        company = company[0].name if company else "ERPMAX Company"
+    """Get company information for templates
     
-    company_doc = frappe.get_doc("Company", company) if frappe.db.exists("Company", company) else None
+    Memoized for the request (one bulk print renders many documents in one
+    request) and backed by a process-level cache of Company details that
+    Company updates invalidate through the cache registry.
+    """
+    memo = _get_render_memo()
     
-    return {
+    if "company_info" not in memo:
+        company = frappe.defaults.get_user_default("Company")
+        if not company:
+            company = frappe.get_all("Company", limit=1)
+            company = company[0].name if company else "ERPMAX Company"
+        
+        memo["company_info"] = get_company_details(company)
+    
+    return dict(memo["company_info"])
+
+
+def get_company_details(company):
+    """Get template details of a company from the process-level cache"""
+    key = (frappe.local.site, company)
+    generation = get_generation("company")
+    
+    cached = _company_cache.get(key)
+    if cached and cached[0] == generation:
+        return cached[1]
+    
+    company_doc = frappe.db.get_value(
+        "Company", company, ["abbr", "default_currency", "country"], as_dict=True
+    )
+    
+    details = {
         "company_name": company,
         "company_abbr": company_doc.abbr if company_doc else "ERPMAX",
         "default_currency": company_doc.default_currency if company_doc else "USD",
         "country": company_doc.country if company_doc else "United States"
     }
+    
+    _company_cache[key] = (generation, details)
+    return details
 
 
 @frappe.whitelist()
 def get_user_info():
     """Get current user information"""
     user = frappe.session.user
-    user_doc = frappe.get_doc("User", user)
+    memo = _get_render_memo()
     
-    return {
-        "user_id": user,
-        "full_name": user_doc.full_name,
-        "email": user_doc.email,
-        "role_profile": user_doc.role_profile_name,
-        "language": user_doc.language or "en",
-        "time_zone": user_doc.time_zone or "UTC"
-    }
+    if ("user_info", user) not in memo:
+        user_doc = frappe.db.get_value(
+            "User", user,
+            ["full_name", "email", "role_profile_name", "language", "time_zone"],
+            as_dict=True
+        ) or frappe._dict()
+        
+        memo[("user_info", user)] = {
+            "user_id": user,
+            "full_name": user_doc.full_name,
+            "email": user_doc.email,
+            "role_profile": user_doc.role_profile_name,
+            "language": user_doc.language or "en",
+            "time_zone": user_doc.time_zone or "UTC"
+        }
+    
+    return dict(memo[("user_info", user)])
+
+
+def _get_render_memo():
+    """Get the memo shared by template helpers during one request"""
+    if not hasattr(frappe.local, "erpmax_render_memo"):
+        frappe.local.erpmax_render_memo = {}
+    return frappe.local.erpmax_render_memo
 
 
 @frappe.whitelist()
 def clear_cache():
-    """Clear application cache"""
+    """Clear the whole application cache (explicit admin action)"""
+    frappe.only_for("System Manager")
+    
     frappe.clear_cache()
+    clear_erpmax_cache()
     return {"message": "Cache cleared successfully"}
 
 
@@ -67,7 +121,7 @@ def log_creation(doc, method):
         return
     
     # Log creation event
-    frappe.logger().info(f"ERPMAX: {doc.doctype} {doc.name} created by {frappe.session.user}")
+    logs.info(f"ERPMAX: {doc.doctype} {doc.name} created by {frappe.session.user}")
 
 
 @frappe.whitelist()
@@ -78,6 +132,10 @@ def get_events(start, end, user=None, for_reminder=False, filters=None):
     # Get standard events
     events = get_frappe_events(start, end, user, for_reminder, filters)
     
+    # Resolve ERPMAX event permissions for the whole page at once
+    permissions = get_event_permissions([event.get("name") for event in events], user)
+    events = [event for event in events if permissions.get(event.get("name"))]
+    
     # Add ERPMAX customizations
     for event in events:
         event['app'] = 'erpmax'
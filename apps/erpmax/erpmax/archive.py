@@ -0,0 +1,242 @@
+# ERPMAX Data Archival
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+
+import frappe
+from frappe.utils import add_days, cint, now_datetime
+
+from erpmax.utils import get_affected_rows
+
+
+# Rows older than `age_days` (by creation) that match `conditions` are moved
+# to `tabArchived <doctype>`. Override per doctype with the
+# `erpmax_archive_policies` site config.
+#
+# `referenced_by` and `dependents` list `(table, doctype column, name
+# column)` links to the archived document; the doctype column is None when
+# the link can only point to this doctype. Rows still referenced through
+# `referenced_by` are kept, so those links never dangle. `dependents` rows
+# are moved along with the document they belong to.
+ARCHIVE_POLICIES = {
+    "Error Log": {"age_days": 30},
+    "Activity Log": {"age_days": 180},
+    # Only cancelled invoices: submitted ones are still referenced by ledgers
+    "Sales Invoice": {
+        "age_days": 730,
+        "conditions": "docstatus = 2",
+        "referenced_by": [
+            ("Sales Invoice", None, "amended_from"),
+            ("Sales Invoice", None, "return_against"),
+            # Attachments stay, their files on disk belong to the File rows
+            ("File", "attached_to_doctype", "attached_to_name")
+        ],
+        "dependents": [
+            ("Comment", "reference_doctype", "reference_name"),
+            ("Version", "ref_doctype", "docname"),
+            # The cancelled invoice's own, already reversed, ledger rows
+            ("GL Entry", "voucher_type", "voucher_no"),
+            ("Payment Ledger Entry", "voucher_type", "voucher_no")
+        ]
+    }
+}
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAUSE = 0.2
+DEFAULT_TIME_BUDGET = 3600
+
+
+def get_archive_policies():
+    policies = {doctype: dict(policy) for doctype, policy in ARCHIVE_POLICIES.items()}
+
+    for doctype, policy in (frappe.conf.get("erpmax_archive_policies") or {}).items():
+        if policy:
+            policies.setdefault(doctype, {}).update(policy)
+        else:
+            policies.pop(doctype, None)
+
+    return policies
+
+
+def get_archive_table(doctype):
+    return f"Archived {doctype}"
+
+
+def run_archival(batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, time_budget=DEFAULT_TIME_BUDGET):
+    """Archive every doctype with a policy, within a total time budget
+
+    Returns `{doctype: rows archived}`. Doctypes not finished within the
+    budget continue on the next run.
+    """
+    deadline = time.monotonic() + time_budget
+    archived = {}
+
+    for doctype, policy in get_archive_policies().items():
+        archived[doctype] = archive_doctype(
+            doctype, policy, batch_size=batch_size, pause=pause, deadline=deadline
+        )
+
+    return archived
+
+
+def archive_doctype(doctype, policy, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, deadline=None):
+    """Stream old rows of a doctype (and its child rows) into archive tables
+
+    Each batch is copied and deleted in its own small transaction, with a
+    pause between batches so the hot tables are never locked for long.
+    """
+    cutoff = add_days(now_datetime(), -cint(policy["age_days"]))
+    conditions = f"AND ({policy['conditions']})" if policy.get("conditions") else ""
+    conditions += get_unreferenced_conditions(doctype, policy.get("referenced_by") or [])
+    child_doctypes = [df.options for df in frappe.get_meta(doctype).get_table_fields()]
+    dependents = [
+        (table, doctype_column, name_column)
+        for table, doctype_column, name_column in policy.get("dependents") or []
+        if frappe.db.table_exists(table)
+    ]
+
+    for table in [doctype] + child_doctypes + [dependent[0] for dependent in dependents]:
+        ensure_archive_table(table)
+
+    archived = 0
+    while deadline is None or time.monotonic() < deadline:
+        names = frappe.db.sql_list(f"""
+            SELECT name
+            FROM `tab{doctype}`
+            WHERE creation < %(cutoff)s
+            {conditions}
+            ORDER BY creation
+            LIMIT %(limit)s
+        """, {"cutoff": cutoff, "limit": batch_size, "doctype": doctype})
+
+        if not names:
+            break
+
+        for table, doctype_column, name_column in dependents:
+            _move_rows(
+                table,
+                _link_conditions(doctype_column, name_column, "IN %(names)s"),
+                {"names": tuple(names), "doctype": doctype}
+            )
+        for child_doctype in child_doctypes:
+            _move_rows(
+                child_doctype,
+                "parent IN %(names)s AND parenttype = %(parenttype)s",
+                {"names": tuple(names), "parenttype": doctype}
+            )
+        _move_rows(doctype, "name IN %(names)s", {"names": tuple(names)})
+
+        frappe.db.commit()
+        archived += len(names)
+        time.sleep(pause)
+
+    return archived
+
+
+def get_unreferenced_conditions(doctype, referenced_by):
+    """Get the conditions excluding rows that other documents still link to"""
+    conditions = ""
+
+    for table, doctype_column, name_column in referenced_by:
+        if frappe.db.table_exists(table):
+            link = _link_conditions(doctype_column, name_column, f"= `tab{doctype}`.name", "ref.")
+            conditions += f" AND NOT EXISTS (SELECT 1 FROM `tab{table}` ref WHERE {link})"
+
+    return conditions
+
+
+def _link_conditions(doctype_column, name_column, match, prefix=""):
+    conditions = f"{prefix}`{name_column}` {match}"
+    if doctype_column:
+        conditions += f" AND {prefix}`{doctype_column}` = %(doctype)s"
+    return conditions
+
+
+def ensure_archive_table(doctype):
+    """Create the archive table of a doctype, following column changes of the hot table"""
+    archive_table = get_archive_table(doctype)
+    frappe.db.sql_ddl(f"CREATE TABLE IF NOT EXISTS `tab{archive_table}` LIKE `tab{doctype}`")
+
+    archive_columns = {
+        column.Field: column.Type
+        for column in frappe.db.sql(f"SHOW COLUMNS FROM `tab{archive_table}`", as_dict=True)
+    }
+    for column in frappe.db.sql(f"SHOW COLUMNS FROM `tab{doctype}`", as_dict=True):
+        if column.Field not in archive_columns:
+            frappe.db.sql_ddl(
+                f"ALTER TABLE `tab{archive_table}` ADD COLUMN `{column.Field}` {column.Type} NULL"
+            )
+        elif archive_columns[column.Field] != column.Type:
+            frappe.db.sql_ddl(
+                f"ALTER TABLE `tab{archive_table}` MODIFY COLUMN `{column.Field}` {column.Type} NULL"
+            )
+
+
+def _move_rows(doctype, conditions, values):
+    """Copy matching rows into the archive table, deleting them only once all were copied
+
+    A plain INSERT fails on duplicate names or values that do not fit, and
+    the copied row count must equal the selected one, so rows are never
+    deleted without their archived copy.
+    """
+    columns = ", ".join(f"`{column}`" for column in frappe.db.get_table_columns(doctype))
+
+    selected = frappe.db.sql(f"SELECT COUNT(*) FROM `tab{doctype}` WHERE {conditions}", values)[0][0]
+    if not selected:
+        return
+
+    frappe.db.sql(f"""
+        INSERT INTO `tab{get_archive_table(doctype)}` ({columns})
+        SELECT {columns} FROM `tab{doctype}` WHERE {conditions}
+    """, values)
+
+    copied = get_affected_rows()
+    if copied != selected:
+        frappe.throw(f"Archiving {doctype} copied {copied} of {selected} rows, nothing was deleted")
+
+    frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE {conditions}", values)
+
+
+@frappe.whitelist()
+def get_archived_doc(doctype, name):
+    """Get a document by name from its hot table or, once archived, its archive table
+
+    Only the document and its child rows are returned. Its dependents
+    (comments, versions, ledger rows) are in their own archive tables,
+    e.g. `tabArchived GL Entry`. Documents that linked to it through a
+    `referenced_by` link were never archived, so such links (an amended
+    invoice's `amended_from`) always resolve here from the hot table. Links
+    from the archived document to other records are returned as stored and
+    may name records deleted since.
+    """
+    if frappe.db.exists(doctype, name):
+        doc = frappe.get_doc(doctype, name)
+        frappe.has_permission(doctype, "read", doc=doc, throw=True)
+        return doc.as_dict()
+
+    if doctype not in get_archive_policies():
+        frappe.throw(f"{doctype} {name} not found", frappe.DoesNotExistError)
+
+    rows = frappe.db.sql(
+        f"SELECT * FROM `tab{get_archive_table(doctype)}` WHERE name = %s", [name], as_dict=True
+    )
+    if not rows:
+        frappe.throw(f"{doctype} {name} not found", frappe.DoesNotExistError)
+
+    values = rows[0]
+    for df in frappe.get_meta(doctype).get_table_fields():
+        values[df.fieldname] = frappe.db.sql(f"""
+            SELECT *
+            FROM `tab{get_archive_table(df.options)}`
+            WHERE parent = %s AND parenttype = %s AND parentfield = %s
+            ORDER BY idx
+        """, [name, doctype, df.fieldname], as_dict=True)
+
+    # An unsaved Document built from the archived row, so record-level rules
+    # (owner, user permissions) apply as they would to the hot document
+    doc = frappe.get_doc(dict(values, doctype=doctype))
+    frappe.has_permission(doctype, "read", doc=doc, throw=True)
+
+    archived = doc.as_dict()
+    archived["archived"] = 1
+    return archived
@@ -1,56 +1,171 @@
 # ERPMAX Authentication Enhancements
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import threading
+import time
+
 import frappe
 from frappe import _
-from frappe.utils import now
+from frappe.utils import cint, now
+
+from erpmax import logs
+from erpmax.cache import get_generation, get_user_version
+from erpmax.roles import get_roles, has_erpmax_access, has_role, is_erpmax_manager
+from erpmax.utils import read_raw
+
+
+# Seconds an auth decision is reused (site config: erpmax_auth_decision_ttl)
+DEFAULT_DECISION_TTL = 60
+
+METRICS_KEY = "erpmax:auth_metrics"
+METRICS_FLUSH_EVERY = 100
+
+_decisions = {}
+_metrics = {}
+_pending_metrics = {}
+_pending_decisions = 0
+_metrics_lock = threading.Lock()
 
 
-def validate_auth(doc, method):
-    """Enhanced authentication validation for ERPMAX"""
+def validate_auth(doc=None, method=None):
+    """Enhanced authentication validation for ERPMAX
+    
+    Decisions are kept per process under the user's version and the role
+    generation for a short TTL, so repeated requests of a user (typically
+    API key clients) skip role resolution and logging entirely. Saving the
+    User (roles, enabled status) or any Role invalidates them.
+    """
+    
+    started = time.perf_counter()
+    user = doc.name if doc else frappe.session.user
+    
+    if user == "Administrator":
+        _record_decision("administrator", started)
+        return
+    
+    key = (get_user_version(user), get_generation("roles"))
+    decision = _decisions.get((frappe.local.site, user))
+    
+    if decision and decision[0] == key and decision[1] > time.monotonic():
+        _record_decision("api_key_hit" if is_api_key_request() else "hit", started)
+        return
     
-    # Log authentication attempts
-    frappe.logger().info(f"ERPMAX: Authentication attempt for user {doc.name}")
+    has_access = validate_erpmax_access(user)
+    _decisions[(frappe.local.site, user)] = (key, time.monotonic() + get_decision_ttl(), has_access)
     
-    # Add custom validation logic here
-    if doc.name != "Administrator":
-        # Check if user has ERPMAX access
-        validate_erpmax_access(doc)
+    logs.info(f"ERPMAX: User {user} authenticated (ERPMAX access: {has_access})")
+    _record_decision("api_key_miss" if is_api_key_request() else "miss", started)
+
+
+def get_decision_ttl():
+    return cint(frappe.conf.get("erpmax_auth_decision_ttl")) or DEFAULT_DECISION_TTL
+
+
+def is_api_key_request():
+    """Check whether the request authenticates with an API key and secret"""
+    
+    if not getattr(frappe.local, "request", None):
+        return False
     
-    # Log successful authentication
-    frappe.logger().info(f"ERPMAX: User {doc.name} authenticated successfully")
+    authorization = frappe.get_request_header("Authorization") or ""
+    return authorization.lower().startswith(("token ", "basic "))
 
 
-def validate_erpmax_access(user_doc):
-    """Validate user access to ERPMAX features"""
+def on_user_change(doc, method=None):
+    """User event hook dropping the user's auth decision in this process
     
-    # Check if user has required roles
-    user_roles = frappe.get_roles(user_doc.name)
+    Other processes notice the bumped user version on their next request.
+    """
     
-    # ERPMAX specific role validation
-    erpmax_roles = ["ERPMAX Manager", "ERPMAX User", "System Manager"]
+    _decisions.pop((frappe.local.site, doc.name), None)
+
+
+def validate_erpmax_access(user):
+    """Validate user access to ERPMAX features (`user` may also be a User document)"""
     
-    has_access = any(role in erpmax_roles for role in user_roles)
+    user = getattr(user, "name", user)
+    
+    # Check if user has required roles
+    has_access = has_erpmax_access(user)
     
     if not has_access:
-        frappe.logger().warning(f"User {user_doc.name} does not have ERPMAX access")
+        logs.warning(f"User {user} does not have ERPMAX access")
         # You can add additional logic here if needed
     
     return has_access
 
 
+def _record_decision(kind, started):
+    """Count a decision and its duration, pushing to Redis every few decisions"""
+    
+    global _pending_decisions
+    
+    elapsed_us = int((time.perf_counter() - started) * 1000000)
+    
+    with _metrics_lock:
+        for metrics in (_metrics, _pending_metrics):
+            metrics[f"{kind}:count"] = metrics.get(f"{kind}:count", 0) + 1
+            metrics[f"{kind}:total_us"] = metrics.get(f"{kind}:total_us", 0) + elapsed_us
+        
+        _pending_decisions += 1
+        if _pending_decisions < METRICS_FLUSH_EVERY:
+            return
+        
+        pending = dict(_pending_metrics)
+        _pending_metrics.clear()
+        _pending_decisions = 0
+    
+    try:
+        pipe = frappe.cache().pipeline()
+        for field, value in pending.items():
+            pipe.hincrby(frappe.cache().make_key(METRICS_KEY), field, value)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+@frappe.whitelist()
+def get_auth_metrics():
+    """Get auth decision counts and mean durations for this process and the whole site"""
+    
+    frappe.only_for("System Manager")
+    
+    site = read_raw("hgetall", frappe.cache().make_key(METRICS_KEY)) or {}
+    
+    with _metrics_lock:
+        process = dict(_metrics)
+    
+    return {
+        "process": _summarize_metrics(process),
+        "site": _summarize_metrics({frappe.safe_decode(field): int(value) for field, value in site.items()})
+    }
+
+
+def _summarize_metrics(metrics):
+    summary = {}
+    
+    for field, value in metrics.items():
+        kind, measure = field.rsplit(":", 1)
+        summary.setdefault(kind, {})[measure] = value
+    
+    for values in summary.values():
+        count = values.get("count") or 0
+        values["mean_us"] = round(values.get("total_us", 0) / count, 1) if count else 0
+    
+    return summary
+
+
 @frappe.whitelist()
 def get_user_permissions():
     """Get enhanced user permissions for ERPMAX"""
     
     user = frappe.session.user
-    roles = frappe.get_roles(user)
     
     permissions = {
         "user": user,
-        "roles": roles,
-        "has_erpmax_access": any(role in ["ERPMAX Manager", "ERPMAX User", "System Manager"] for role in roles),
-        "is_erpmax_manager": "ERPMAX Manager" in roles,
+        "roles": get_roles(user),
+        "has_erpmax_access": has_erpmax_access(user),
+        "is_erpmax_manager": is_erpmax_manager(user),
         "timestamp": now()
     }
     
@@ -63,7 +178,7 @@ def on_login(login_manager):
     user = login_manager.user
     
     # Log login
-    frappe.logger().info(f"ERPMAX: User {user} logged in successfully")
+    logs.info(f"ERPMAX: User {user} logged in successfully")
     
     # Update last login timestamp
     frappe.db.set_value("User", user, "last_login", now())
@@ -91,8 +206,7 @@ def add_to_erpmax_group(user):
             role.insert(ignore_permissions=True)
         
         # Add role to user if not already added
-        user_roles = frappe.get_roles(user)
-        if "ERPMAX User" not in user_roles:
+        if not has_role(user, "ERPMAX User"):
             user_doc = frappe.get_doc("User", user)
             user_doc.append("roles", {
                 "role": "ERPMAX User"
@@ -102,7 +216,7 @@ def add_to_erpmax_group(user):
         frappe.db.commit()
         
     except Exception as e:
-        frappe.logger().error(f"Error adding user to ERPMAX group: {str(e)}")
+        logs.error(f"Error adding user to ERPMAX group: {str(e)}")
 
 
 def on_logout(login_manager):
@@ -111,7 +225,7 @@ def on_logout(login_manager):
     user = login_manager.user if login_manager else frappe.session.user
     
     # Log logout
-    frappe.logger().info(f"ERPMAX: User {user} logged out")
+    logs.info(f"ERPMAX: User {user} logged out")
     
     # Clear ERPMAX session variables
     if "erpmax_session" in frappe.session:
@@ -142,7 +256,7 @@ def validate_ip_restriction(user):
     
     # You can add IP restriction logic here
     # For now, just log the IP
-    frappe.logger().info(f"ERPMAX: User {user} accessing from IP {ip_address}")
+    logs.info(f"ERPMAX: User {user} accessing from IP {ip_address}")
     
     return True
 
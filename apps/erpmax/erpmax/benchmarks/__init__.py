@@ -0,0 +1,59 @@
+# ERPMAX Benchmarks
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+from contextlib import contextmanager
+
+import frappe
+
+
+@contextmanager
+def count_queries():
+    """Count `frappe.db.sql` round trips made inside the block"""
+    counter = {"queries": 0}
+    original_sql = frappe.db.sql
+
+    def sql(*args, **kwargs):
+        counter["queries"] += 1
+        return original_sql(*args, **kwargs)
+
+    frappe.db.sql = sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = original_sql
+
+
+def measure(function, iterations, setup=None):
+    """Run `function` repeatedly, returning round trips per call and latency in ms"""
+    timings = []
+    queries = 0
+
+    for _i in range(iterations):
+        if setup:
+            setup()
+
+        with count_queries() as counter:
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        queries = counter["queries"]
+
+    timings.sort()
+    return {
+        "round_trips": queries,
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "max_ms": round(timings[-1], 2)
+    }
+
+
+def print_results(title, results):
+    print(title)
+    for name, result in results.items():
+        print(
+            f"  {name:<14} round trips: {result['round_trips']:>3}  "
+            f"mean: {result['mean_ms']:>8} ms  p50: {result['p50_ms']:>8} ms  "
+            f"max: {result['max_ms']:>8} ms"
+        )
@@ -0,0 +1,128 @@
+# ERPMAX Event Permission Benchmark
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import random
+
+import frappe
+
+from erpmax.benchmarks import measure, print_results
+from erpmax.permissions import compile_conditions, set_session_user, USER_VARIABLE
+
+
+EVENTS = 100000
+USERS = 1000
+PARTICIPANTS_PER_EVENT = 3
+PUBLIC_SHARE = 0.1
+INSERT_BATCH_SIZE = 5000
+
+
+def run(iterations=50, events=EVENTS, users=USERS):
+    """Compare the formatted IN subquery with the compiled EXISTS conditions
+
+    Run with `bench --site <site> execute erpmax.benchmarks.event_permissions.run`.
+    Session-scoped temporary tables shadow `tabEvent` and `tabEvent User`
+    (same definition and indexes), so the site's data is never touched.
+    Each iteration lists and counts the events visible to a random user.
+    """
+    iterations, events, users = int(iterations), int(events), int(users)
+    user_names = [f"bench-user-{i}@example.com" for i in range(users)]
+
+    session_user = frappe.session.user
+    create_tables(events, user_names)
+    try:
+        legacy_texts, compiled_texts = set(), set()
+
+        def legacy():
+            user = random.choice(user_names)
+            frappe.set_user(user)
+            conditions = legacy_conditions(user)
+            legacy_texts.add(conditions)
+            list_events(conditions)
+
+        def compiled():
+            user = random.choice(user_names)
+            frappe.set_user(user)
+            set_session_user(user)
+            conditions = compile_conditions("Event", frozenset()).replace("{user}", USER_VARIABLE)
+            compiled_texts.add(conditions)
+            list_events(conditions)
+
+        results = {
+            "legacy": measure(legacy, iterations),
+            "compiled": measure(compiled, iterations)
+        }
+        print_results(f"Event list, {events} events, {users} users ({iterations} iterations)", results)
+        print(f"  distinct statement texts: legacy {len(legacy_texts)}, compiled {len(compiled_texts)}")
+        return results
+
+    finally:
+        frappe.set_user(session_user)
+        drop_tables()
+
+
+def list_events(conditions):
+    frappe.db.sql(f"""
+        SELECT `tabEvent`.name, `tabEvent`.subject, `tabEvent`.starts_on
+        FROM `tabEvent`
+        WHERE {conditions}
+        ORDER BY `tabEvent`.modified DESC
+        LIMIT 20
+    """)
+    frappe.db.sql(f"SELECT COUNT(*) FROM `tabEvent` WHERE {conditions}")
+
+
+def legacy_conditions(user):
+    """The previous implementation, formatting the user into the SQL text"""
+    return f"""(
+        `tabEvent`.owner = '{user}'
+        OR `tabEvent`.event_type = 'Public'
+        OR `tabEvent`.name in (
+            SELECT parent FROM `tabEvent User`
+            WHERE `tabEvent User`.user = '{user}'
+        )
+    )"""
+
+
+def create_tables(events, user_names):
+    drop_tables()
+    frappe.db.sql_ddl("CREATE TEMPORARY TABLE `tabEvent` LIKE `tabEvent`")
+    frappe.db.sql_ddl("CREATE TEMPORARY TABLE `tabEvent User` LIKE `tabEvent User`")
+
+    random.seed(42)
+    now = frappe.utils.now()
+
+    for start in range(0, events, INSERT_BATCH_SIZE):
+        names = [f"BENCH-EV-{i:06d}" for i in range(start, min(start + INSERT_BATCH_SIZE, events))]
+
+        rows = [
+            (
+                name, name, random.choice(user_names),
+                "Public" if random.random() < PUBLIC_SHARE else "Private", now, now, now
+            )
+            for name in names
+        ]
+        frappe.db.sql(f"""
+            INSERT INTO `tabEvent` (name, subject, owner, event_type, starts_on, creation, modified)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))}
+        """, [value for row in rows for value in row])
+
+        participants = [
+            (f"{name}-{i}", name, "Event", "users", random.choice(user_names), now, now)
+            for name in names
+            for i in range(PARTICIPANTS_PER_EVENT)
+        ]
+        frappe.db.sql(f"""
+            INSERT INTO `tabEvent User` (name, parent, parenttype, parentfield, user, creation, modified)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(participants))}
+        """, [value for row in participants for value in row])
+
+    # Only the temporary tables were written, so committing touches no site data
+    frappe.db.commit()
+    frappe.db.sql("ANALYZE TABLE `tabEvent`, `tabEvent User`")
+
+
+def drop_tables():
+    """Drop the temporary tables outside any write transaction"""
+    frappe.db.rollback()
+    frappe.db.sql_ddl("DROP TEMPORARY TABLE IF EXISTS `tabEvent User`")
+    frappe.db.sql_ddl("DROP TEMPORARY TABLE IF EXISTS `tabEvent`")
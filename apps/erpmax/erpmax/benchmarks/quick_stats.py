@@ -0,0 +1,77 @@
+# ERPMAX Quick Stats Benchmark
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import get_first_day, nowdate
+
+from erpmax.benchmarks import measure, print_results
+from erpmax.stats import clear_request_memo, get_purchase_stats, get_sales_stats, get_transaction_stats
+
+
+def run(iterations=20):
+    """Compare the per-helper queries with the consolidated stats query
+
+    Run with `bench --site <site> execute erpmax.benchmarks.quick_stats.run`.
+    Both variants compute the same today/month/overdue figures from SQL
+    (counters are bypassed) and are checked for equal results.
+    """
+    iterations = int(iterations)
+
+    legacy, consolidated = legacy_stats(), consolidated_stats()
+    clear_request_memo()
+    if legacy != consolidated:
+        print(f"Results differ:\n  legacy: {legacy}\n  consolidated: {consolidated}")
+
+    results = {
+        "legacy": measure(legacy_stats, iterations),
+        "consolidated": measure(consolidated_stats, iterations, setup=clear_request_memo)
+    }
+    print_results(f"Quick stats ({iterations} iterations)", results)
+    return results
+
+
+def consolidated_stats():
+    stats = get_transaction_stats()
+    data = dict(get_sales_stats())
+    data.update(get_purchase_stats())
+    data.update({
+        "total_revenue_month": stats["Sales Invoice"]["month_total"],
+        "total_orders_month": stats["Sales Order"]["month"],
+        "pending_quotations": stats["Quotation"]["open"],
+        "overdue_invoices": stats["Sales Invoice"]["open"]
+    })
+    return data
+
+
+def legacy_stats():
+    """The previous implementation: one round trip per figure"""
+    today = nowdate()
+    month_start = get_first_day(today)
+
+    data = {}
+    for key, doctype, date_field in (
+        ("sales_orders", "Sales Order", "transaction_date"),
+        ("sales_invoices", "Sales Invoice", "posting_date"),
+        ("purchase_orders", "Purchase Order", "transaction_date"),
+        ("purchase_invoices", "Purchase Invoice", "posting_date")
+    ):
+        data[f"{key}_today"] = frappe.db.count(doctype, {date_field: today, "docstatus": 1})
+        data[f"{key}_month"] = frappe.db.count(
+            doctype, {date_field: [">=", month_start], "docstatus": 1}
+        )
+
+    data["total_revenue_month"] = float(frappe.db.sql("""
+        SELECT COALESCE(SUM(grand_total), 0)
+        FROM `tabSales Invoice`
+        WHERE docstatus = 1
+        AND posting_date >= %s
+    """, [month_start])[0][0] or 0)
+    data["total_orders_month"] = frappe.db.count(
+        "Sales Order", {"transaction_date": [">=", month_start], "docstatus": 1}
+    )
+    data["pending_quotations"] = frappe.db.count("Quotation", {"status": "Open", "docstatus": 1})
+    data["overdue_invoices"] = frappe.db.count(
+        "Sales Invoice",
+        {"due_date": ["<", today], "outstanding_amount": [">=", 0.01], "docstatus": 1}
+    )
+    return data
@@ -1,59 +1,96 @@
 # ERPMAX Boot Configuration
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import copy
+
 import frappe
 from frappe import _
 
+from erpmax.cache import get_cached
+
+
+_static_boot = None
+
 
 def boot_session(bootinfo):
     """Boot session with ERPMAX customizations"""
-    
-    # Add ERPMAX branding
-    bootinfo["app_name"] = "erpmax"
-    bootinfo["app_title"] = "ERPMAX"
-    bootinfo["app_version"] = "1.0.0"
-    bootinfo["app_logo_url"] = "/assets/erpmax/images/erpmax-logo.svg"
-    
-    # Add custom user preferences
+
+    # Add ERPMAX branding, settings and modules (built once per process)
+    bootinfo.update(copy.deepcopy(get_static_boot()))
+
+    # Add custom user preferences (cached under the user's version)
     if frappe.session.user != "Guest":
-        bootinfo["user_info"] = {
-            "full_name": frappe.db.get_value("User", frappe.session.user, "full_name"),
-            "email": frappe.session.user,
-            "language": frappe.db.get_value("User", frappe.session.user, "language") or "en"
-        }
-    
-    # Add ERPMAX specific settings
-    bootinfo["erpmax_settings"] = {
-        "theme_color": "#1976D2",
-        "secondary_color": "#FFC107",
-        "enable_animations": True,
-        "enable_dark_mode": True,
-        "show_app_launcher": True
-    }
-    
-    # Add custom navbar items
-    bootinfo["navbar_settings"] = {
-        "title": "ERPMAX",
-        "logo": "/assets/erpmax/images/erpmax-logo.svg",
-        "favicon": "/assets/erpmax/images/favicon.ico"
+        bootinfo["user_info"] = get_cached(
+            "boot", lambda: get_boot_user_info(frappe.session.user), user=frappe.session.user
+        )
+
+
+def get_static_boot():
+    """Get the boot fragment that only changes between deploys"""
+
+    global _static_boot
+
+    if _static_boot is None:
+        _static_boot = build_static_boot()
+
+    return _static_boot
+
+
+def build_static_boot():
+    """Build the static boot fragment"""
+
+    return {
+        # Add ERPMAX branding
+        "app_name": "erpmax",
+        "app_title": "ERPMAX",
+        "app_version": "1.0.0",
+        "app_logo_url": "/assets/erpmax/images/erpmax-logo.svg",
+
+        # Add ERPMAX specific settings
+        "erpmax_settings": {
+            "theme_color": "#1976D2",
+            "secondary_color": "#FFC107",
+            "enable_animations": True,
+            "enable_dark_mode": True,
+            "show_app_launcher": True
+        },
+
+        # Add custom navbar items
+        "navbar_settings": {
+            "title": "ERPMAX",
+            "logo": "/assets/erpmax/images/erpmax-logo.svg",
+            "favicon": "/assets/erpmax/images/favicon.ico"
+        },
+
+        # Add custom desk settings
+        "desk_settings": {
+            "background_color": "#f5f5f5",
+            "card_shadow": True,
+            "rounded_corners": True
+        },
+
+        # Add ERPMAX modules
+        "erpmax_modules": [
+            "Dashboard",
+            "Sales",
+            "Purchase",
+            "Inventory",
+            "Accounting",
+            "HR",
+            "CRM",
+            "Reports",
+            "Settings"
+        ]
     }
-    
-    # Add custom desk settings
-    bootinfo["desk_settings"] = {
-        "background_color": "#f5f5f5",
-        "card_shadow": True,
-        "rounded_corners": True
+
+
+def get_boot_user_info(user):
+    """Get user preferences added to the boot payload"""
+
+    user_info = frappe.db.get_value("User", user, ["full_name", "language"], as_dict=True) or {}
+
+    return {
+        "full_name": user_info.get("full_name"),
+        "email": user,
+        "language": user_info.get("language") or "en"
     }
-    
-    # Add ERPMAX modules
-    bootinfo["erpmax_modules"] = [
-        "Dashboard",
-        "Sales", 
-        "Purchase",
-        "Inventory",
-        "Accounting",
-        "HR",
-        "CRM",
-        "Reports",
-        "Settings"
-    ]
@@ -0,0 +1,158 @@
+# ERPMAX Cache Registry
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+
+DEFAULT_CACHE_TTL = 3600
+
+# Every ERPMAX cache entry declares the doctypes it is derived from. Saving a
+# document of one of those doctypes evicts only the dependent entries.
+CACHE_ENTRIES = {
+    # Per-user bundles expire through their TTL and are rebuilt by the
+    # background refresher: a generation bump on every save of these
+    # high-churn doctypes would invalidate every user's bundle at once
+    "notifications": {
+        "doctypes": [],
+        "per_user": True,
+        "ttl": 300
+    },
+    "notifications_shared": {
+        "doctypes": ["Sales Invoice", "Quotation", "Bin", "Item"],
+        "per_user": False,
+        "ttl": 900
+    },
+    # Boot user info only depends on the User, covered by the user version
+    "boot": {
+        "doctypes": [],
+        "per_user": True,
+        "ttl": DEFAULT_CACHE_TTL
+    },
+    # Process-level Company details used by print format helpers
+    "company": {
+        "doctypes": ["Company"],
+        "per_user": False,
+        "ttl": DEFAULT_CACHE_TTL
+    },
+    "roles": {
+        "doctypes": ["Role"],
+        "per_user": True,
+        "ttl": 6 * 3600
+    }
+}
+
+_doctype_index = {}
+
+
+def register_cache_entry(name, doctypes, per_user=False, ttl=DEFAULT_CACHE_TTL):
+    """Register a cache entry and the doctypes it depends on"""
+    CACHE_ENTRIES[name] = {"doctypes": list(doctypes), "per_user": per_user, "ttl": ttl}
+    _doctype_index.clear()
+
+
+def get_dependent_entries(doctype):
+    """Get names of the cache entries that depend on `doctype`"""
+    if not _doctype_index:
+        for name, entry in CACHE_ENTRIES.items():
+            for dependency in entry["doctypes"]:
+                _doctype_index.setdefault(dependency, set()).add(name)
+
+    return _doctype_index.get(doctype, ())
+
+
+def get_cached(name, generator, user=None):
+    """Get a registered cache entry, building it with `generator` on a miss"""
+    entry = CACHE_ENTRIES[name]
+    key = get_cache_key(name, user if entry["per_user"] else None)
+
+    value = frappe.cache().get_value(key)
+    if value is None:
+        value = generator()
+        frappe.cache().set_value(key, value, expires_in_sec=entry["ttl"])
+
+    return value
+
+
+def get_cache_key(name, user=None):
+    """Get the current key of a cache entry
+
+    Keys embed a generation number, so evicting an entry is a single INCR
+    and never a key scan. Keys of old generations expire through their TTL.
+    Per-user keys also embed the user version, which is bumped whenever the
+    User document (and with it its Has Role rows) changes.
+    """
+    key = f"erpmax:{name}:{get_generation(name)}"
+    if user:
+        key += f":{user}:{get_user_version(user)}"
+    return key
+
+
+def get_generation(name):
+    """Get the generation of a cache entry, memoized for the request"""
+    generations = _get_request_generations()
+
+    if name not in generations:
+        value = frappe.cache().get(_make_generation_key(name))
+        generations[name] = int(value or 0)
+
+    return generations[name]
+
+
+def get_user_version(user):
+    """Get the version of a user, memoized for the request"""
+    versions = _get_request_user_versions()
+
+    if user not in versions:
+        value = frappe.cache().get(_make_user_version_key(user))
+        versions[user] = int(value or 0)
+
+    return versions[user]
+
+
+def bump_user_version(user):
+    """Invalidate every per-user cache entry of `user`"""
+    versions = _get_request_user_versions()
+    versions[user] = frappe.cache().incr(_make_user_version_key(user))
+
+
+def evict(name):
+    """Evict every key of a cache entry"""
+    generations = _get_request_generations()
+    generations[name] = frappe.cache().incr(_make_generation_key(name))
+
+
+def invalidate_doctype(doctype):
+    """Evict the cache entries that depend on `doctype`"""
+    for name in get_dependent_entries(doctype):
+        evict(name)
+
+
+def clear_all():
+    """Evict every registered ERPMAX cache entry"""
+    for name in CACHE_ENTRIES:
+        evict(name)
+
+
+def on_doc_change(doc, method=None):
+    """Document event hook evicting the entries that depend on the document"""
+    invalidate_doctype(doc.doctype)
+
+
+def _make_generation_key(name):
+    return frappe.cache().make_key(f"erpmax:generation:{name}")
+
+
+def _get_request_generations():
+    if not hasattr(frappe.local, "erpmax_cache_generations"):
+        frappe.local.erpmax_cache_generations = {}
+    return frappe.local.erpmax_cache_generations
+
+
+def _make_user_version_key(user):
+    return frappe.cache().make_key(f"erpmax:user_version:{user}")
+
+
+def _get_request_user_versions():
+    if not hasattr(frappe.local, "erpmax_user_versions"):
+        frappe.local.erpmax_user_versions = {}
+    return frappe.local.erpmax_user_versions
@@ -0,0 +1,49 @@
+# ERPMAX Bench Commands
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+def _connect(context):
+    frappe.init(site=get_site(context))
+    frappe.connect()
+
+
+@click.command("erpmax-rebuild-user-stats")
+@click.option("--from-date", required=True, help="First day to rebuild (YYYY-MM-DD)")
+@click.option("--to-date", help="Last day to rebuild, defaults to today")
+@pass_context
+def rebuild_user_stats(context, from_date, to_date=None):
+    """Rebuild ERPMAX per-user daily creation and login counters"""
+    from erpmax.user_stats import rebuild_user_daily_stats
+
+    _connect(context)
+    try:
+        written = rebuild_user_daily_stats(from_date, to_date)
+        click.echo(f"Rebuilt {written} user daily stat rows")
+    finally:
+        frappe.destroy()
+
+
+@click.command("erpmax-rebuild-sales-rollups")
+@click.option("--from-date", required=True, help="First day to rebuild (YYYY-MM-DD)")
+@click.option("--to-date", help="Last day to rebuild, defaults to today")
+@pass_context
+def rebuild_sales_rollups(context, from_date, to_date=None):
+    """Rebuild ERPMAX customer and item daily sales rollups"""
+    from erpmax.rollups import rebuild_sales_rollups
+
+    _connect(context)
+    try:
+        written = rebuild_sales_rollups(from_date, to_date)
+        click.echo(f"Rebuilt {written} sales rollup rows")
+    finally:
+        frappe.destroy()
+
+
+commands = [
+    rebuild_user_stats,
+    rebuild_sales_rollups
+]
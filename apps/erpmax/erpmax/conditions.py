@@ -0,0 +1,286 @@
+# ERPMAX Condition Compiler
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import ast
+import operator
+from functools import lru_cache
+
+import frappe
+
+
+class UnsupportedCondition(ValueError):
+    pass
+
+
+ORDERING_OPERATORS = {
+    ast.Lt: (operator.lt, "<"),
+    ast.LtE: (operator.le, "<="),
+    ast.Gt: (operator.gt, ">"),
+    ast.GtE: (operator.ge, ">=")
+}
+
+# Operator to use when the operands of an ordering comparison are swapped
+SWAPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+MATCH_PAGE_SIZE = 1000
+
+
+class Condition(object):
+    """A compiled condition expression
+
+    Supports comparisons (`==`, `!=`, `<`, `<=`, `>`, `>=`, `in`, `not in`,
+    chained too), `and`, `or` and `not` over `doc.<field>`, plain names
+    looked up in an evaluation context, and literals. Anything else (calls,
+    arithmetic, subscripts, dunder attributes) is rejected when compiling,
+    so evaluation never runs arbitrary code.
+
+    Missing values follow SQL semantics: a comparison with None is False
+    (except `!=` and `not in`), so `sql` always selects the same documents
+    as `predicate`. `sql` is None when the condition uses context names or
+    `not`, and matching then falls back to Python.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.fields = set()
+        self.uses_context = False
+
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise UnsupportedCondition(f"Invalid condition {expression!r}: {e}")
+
+        self._evaluate = self._compile(tree.body)
+
+        try:
+            self.sql, self.values = _to_sql(tree.body)
+        except UnsupportedCondition:
+            self.sql, self.values = None, None
+
+    def predicate(self, doc, context=None):
+        """Check whether `doc` (a Document or dict) matches"""
+        return bool(self._evaluate(doc, context or {}))
+
+    def evaluate(self, docs, context=None):
+        """Evaluate the condition over a list of documents at once"""
+        context = context or {}
+        evaluate = self._evaluate
+        return [bool(evaluate(doc, context)) for doc in docs]
+
+    def filter(self, docs, context=None):
+        """Get the documents of a list that match"""
+        context = context or {}
+        evaluate = self._evaluate
+        return [doc for doc in docs if evaluate(doc, context)]
+
+    def _compile(self, node):
+        if isinstance(node, ast.BoolOp):
+            operands = [self._compile(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda doc, context: all(operand(doc, context) for operand in operands)
+            return lambda doc, context: any(operand(doc, context) for operand in operands)
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = self._compile(node.operand)
+            return lambda doc, context: not operand(doc, context)
+
+        if isinstance(node, ast.Compare):
+            operands = [self._compile(node.left)] + [self._compile(value) for value in node.comparators]
+            comparisons = [_compile_comparison(op) for op in node.ops]
+
+            def compare(doc, context):
+                values = [operand(doc, context) for operand in operands]
+                return all(
+                    comparison(values[i], values[i + 1]) for i, comparison in enumerate(comparisons)
+                )
+            return compare
+
+        if _is_doc_field(node):
+            fieldname = node.attr
+            self.fields.add(fieldname)
+            return lambda doc, context: doc.get(fieldname)
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            self.uses_context = True
+            return lambda doc, context: context.get(name)
+
+        if _is_literal(node):
+            value = ast.literal_eval(node)
+            return lambda doc, context: value
+
+        raise UnsupportedCondition(
+            f"Unsupported expression {ast.dump(node)} in condition {self.expression!r}"
+        )
+
+
+def _compile_comparison(op):
+    if type(op) in ORDERING_OPERATORS:
+        compare = ORDERING_OPERATORS[type(op)][0]
+
+        def ordering(left, right):
+            if left is None or right is None:
+                return False
+            try:
+                return compare(left, right)
+            except TypeError:
+                return False
+        return ordering
+
+    if isinstance(op, ast.Eq):
+        return operator.eq
+    if isinstance(op, ast.NotEq):
+        return operator.ne
+    if isinstance(op, ast.In):
+        return lambda left, right: left is not None and left in right
+    if isinstance(op, ast.NotIn):
+        return lambda left, right: left is None or left not in right
+
+    raise UnsupportedCondition(f"Unsupported operator {type(op).__name__}")
+
+
+def _is_doc_field(node):
+    return (
+        isinstance(node, ast.Attribute)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "doc"
+        and not node.attr.startswith("__")
+    )
+
+
+def _is_literal(node):
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return all(_is_literal(element) for element in node.elts)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return _is_literal(node.operand)
+    return isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool, type(None)))
+
+
+def _to_sql(node):
+    """Translate a condition into a `(fragment, values)` pair with %s placeholders"""
+    if isinstance(node, ast.BoolOp):
+        parts = [_to_sql(value) for value in node.values]
+        joiner = " AND " if isinstance(node.op, ast.And) else " OR "
+        return (
+            "(" + joiner.join(sql for sql, _values in parts) + ")",
+            [value for _sql, values in parts for value in values]
+        )
+
+    if isinstance(node, ast.Compare):
+        parts = []
+        operands = [node.left] + node.comparators
+        for i, op in enumerate(node.ops):
+            parts.append(_comparison_to_sql(operands[i], op, operands[i + 1]))
+        if len(parts) == 1:
+            return parts[0]
+        return (
+            "(" + " AND ".join(sql for sql, _values in parts) + ")",
+            [value for _sql, values in parts for value in values]
+        )
+
+    raise UnsupportedCondition("Only comparisons, `and` and `or` translate to SQL")
+
+
+def _comparison_to_sql(left, op, right):
+    if not _is_doc_field(left) and _is_doc_field(right) and type(op) in ORDERING_OPERATORS:
+        left, right = right, left
+        op_sql = SWAPPED[ORDERING_OPERATORS[type(op)][1]]
+    elif not _is_doc_field(left) and _is_doc_field(right) and isinstance(op, (ast.Eq, ast.NotEq)):
+        left, right = right, left
+        op_sql = None
+    else:
+        op_sql = ORDERING_OPERATORS[type(op)][1] if type(op) in ORDERING_OPERATORS else None
+
+    if not _is_doc_field(left):
+        raise UnsupportedCondition("Comparisons must involve a document field")
+
+    column = f"`{left.attr}`"
+
+    if _is_doc_field(right):
+        other = f"`{right.attr}`"
+        if op_sql:
+            return f"{column} {op_sql} {other}", []
+        if isinstance(op, ast.Eq):
+            return f"{column} <=> {other}", []
+        if isinstance(op, ast.NotEq):
+            return f"NOT ({column} <=> {other})", []
+        raise UnsupportedCondition("Unsupported comparison between fields")
+
+    if not _is_literal(right):
+        raise UnsupportedCondition("Only literals can be compared with a field in SQL")
+
+    value = ast.literal_eval(right)
+
+    if isinstance(op, (ast.In, ast.NotIn)):
+        if not isinstance(value, (tuple, list)) or not value or None in value:
+            raise UnsupportedCondition("`in` needs a non-empty list without None")
+        placeholders = ", ".join(["%s"] * len(value))
+        if isinstance(op, ast.In):
+            return f"{column} IN ({placeholders})", list(value)
+        return f"({column} IS NULL OR {column} NOT IN ({placeholders}))", list(value)
+
+    if isinstance(value, (tuple, list)):
+        raise UnsupportedCondition("Lists can only be used with `in`")
+
+    if isinstance(op, ast.Eq):
+        return (f"{column} IS NULL", []) if value is None else (f"{column} = %s", [value])
+    if isinstance(op, ast.NotEq):
+        if value is None:
+            return f"{column} IS NOT NULL", []
+        return f"({column} IS NULL OR {column} != %s)", [value]
+    if op_sql and value is not None:
+        return f"{column} {op_sql} %s", [value]
+
+    raise UnsupportedCondition("Unsupported comparison")
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression):
+    """Compile a condition expression once per process
+
+    Raises UnsupportedCondition for expressions outside the safe subset.
+    """
+    return Condition(expression)
+
+
+def count_matching(doctype, condition, conditions=None):
+    """Count the documents of `doctype` that match a condition
+
+    Conditions with an SQL translation are counted by the database. Others
+    are evaluated in Python over the needed fields only, one page at a time.
+    `conditions` is an optional SQL fragment restricting the documents.
+    """
+    if isinstance(condition, str):
+        condition = compile_condition(condition)
+
+    if condition.uses_context:
+        raise UnsupportedCondition(f"{condition.expression!r} needs an evaluation context")
+
+    extra_conditions = f"AND ({conditions})" if conditions else ""
+
+    if condition.sql:
+        return frappe.db.sql(f"""
+            SELECT COUNT(*) FROM `tab{doctype}`
+            WHERE {condition.sql}
+            {extra_conditions}
+        """, condition.values)[0][0]
+
+    fields = ", ".join(f"`{field}`" for field in sorted(condition.fields - {"name"}))
+    count = 0
+    last_name = ""
+
+    while True:
+        docs = frappe.db.sql(f"""
+            SELECT name{", " + fields if fields else ""}
+            FROM `tab{doctype}`
+            WHERE name > %s
+            {extra_conditions}
+            ORDER BY name
+            LIMIT %s
+        """, [last_name, MATCH_PAGE_SIZE], as_dict=True)
+
+        if not docs:
+            return count
+
+        count += sum(condition.evaluate(docs))
+        last_name = docs[-1].name
@@ -0,0 +1,214 @@
+# ERPMAX Transaction Counters
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cstr, flt, get_first_day, getdate, nowdate
+
+from erpmax.utils import read_raw
+
+
+# Counted doctypes and the date field their counters are bucketed by
+COUNTER_DOCTYPES = {
+    "Sales Order": "transaction_date",
+    "Sales Invoice": "posting_date",
+    "Purchase Order": "transaction_date",
+    "Purchase Invoice": "posting_date"
+}
+
+READY_KEY = "erpmax:counters:ready"
+GAUGES_KEY = "erpmax:counters:gauges"
+
+DAY_KEY_EXPIRY = 45 * 24 * 3600
+MONTH_KEY_EXPIRY = 400 * 24 * 3600
+
+
+def on_submit(doc, method=None):
+    """Document event hook counting a submitted document"""
+    update_counters(doc, 1)
+
+
+def on_cancel(doc, method=None):
+    """Document event hook uncounting a cancelled document"""
+    update_counters(doc, -1)
+
+
+def on_update_after_submit(doc, method=None):
+    """Document event hook applying changes made after submit"""
+    before = doc.get_doc_before_save()
+    if not before:
+        return
+
+    if doc.doctype in COUNTER_DOCTYPES and flt(before.grand_total) != flt(doc.grand_total):
+        update_counters(before, -1)
+        update_counters(doc, 1)
+
+
+def update_counters(doc, sign):
+    """Add (`sign` = 1) or remove (`sign` = -1) a document from its counters
+
+    The increments are queued and applied once the document's transaction
+    commits, so a rolled back submit or cancel leaves the counters as they
+    were. Gauges (pending quotations, overdue invoices) change through
+    status updates that fire no document events and are only set by
+    reconciliation.
+    """
+    date_field = COUNTER_DOCTYPES.get(doc.doctype)
+    if not date_field:
+        return
+
+    date = getdate(doc.get(date_field))
+    company = cstr(doc.get("company"))
+    amount = flt(doc.get("grand_total")) * sign
+
+    pending = getattr(frappe.local, "erpmax_pending_counters", None)
+    if pending is None:
+        pending = frappe.local.erpmax_pending_counters = []
+        frappe.db.after_commit.add(_apply_pending_counters)
+        frappe.db.after_rollback.add(_clear_pending_counters)
+
+    for key, expiry in (
+        (get_day_key(doc.doctype, date), DAY_KEY_EXPIRY),
+        (get_month_key(doc.doctype, date), MONTH_KEY_EXPIRY)
+    ):
+        pending.append((key, expiry, company, sign, amount))
+
+
+def _apply_pending_counters():
+    pending = _clear_pending_counters()
+    if not pending:
+        return
+
+    pipe = frappe.cache().pipeline()
+    for key, expiry, company, count, amount in pending:
+        pipe.hincrby(key, f"{company}:count", count)
+        pipe.hincrbyfloat(key, f"{company}:total", amount)
+        pipe.expire(key, expiry)
+    pipe.execute()
+
+
+def _clear_pending_counters():
+    pending = getattr(frappe.local, "erpmax_pending_counters", None) or []
+    frappe.local.erpmax_pending_counters = None
+    return pending
+
+
+def counters_ready():
+    """Check whether counters have been built by a reconciliation run"""
+    return bool(frappe.cache().get(frappe.cache().make_key(READY_KEY)))
+
+
+def get_day_count(doctype, date=None):
+    """Get the number of submitted documents of `doctype` on a day"""
+    return _read(get_day_key(doctype, getdate(date or nowdate())))["count"]
+
+
+def get_month_count(doctype, date=None):
+    """Get the number of submitted documents of `doctype` in a month"""
+    return _read(get_month_key(doctype, getdate(date or nowdate())))["count"]
+
+
+def get_month_total(doctype, date=None):
+    """Get the grand total of submitted documents of `doctype` in a month"""
+    return _read(get_month_key(doctype, getdate(date or nowdate())))["total"]
+
+
+def get_gauge(name):
+    """Get a gauge (pending_quotations, overdue_invoices)"""
+    value = read_raw("hget", frappe.cache().make_key(GAUGES_KEY), name)
+    return int(value or 0)
+
+
+def get_day_key(doctype, date):
+    return frappe.cache().make_key(f"erpmax:counters:{doctype}:{date.isoformat()}")
+
+
+def get_month_key(doctype, date):
+    return frappe.cache().make_key(f"erpmax:counters:{doctype}:{date.strftime('%Y-%m')}")
+
+
+def _read(key):
+    """Sum the per-company fields of a counter hash"""
+    values = {"count": 0, "total": 0.0}
+
+    for field, value in (read_raw("hgetall", key) or {}).items():
+        kind = cstr(field).rsplit(":", 1)[-1]
+        if kind == "count":
+            values["count"] += int(value)
+        elif kind == "total":
+            values["total"] += flt(value)
+
+    return values
+
+
+def reconcile_counters():
+    """Rebuild the current month's counters from SQL and report drift
+
+    Returns a list of `{key, field, counter, actual}` entries for every value
+    that differed from the database before it was overwritten.
+    """
+    today = getdate(nowdate())
+    month_start = get_first_day(today)
+    drift = []
+
+    for doctype, date_field in COUNTER_DOCTYPES.items():
+        rows = frappe.db.sql(f"""
+            SELECT `{date_field}`, company, COUNT(*), COALESCE(SUM(grand_total), 0)
+            FROM `tab{doctype}`
+            WHERE docstatus = 1
+            AND `{date_field}` BETWEEN %s AND %s
+            GROUP BY `{date_field}`, company
+        """, [month_start, today])
+
+        buckets = {get_month_key(doctype, today): {}}
+        for date, company, count, total in rows:
+            for key in (get_day_key(doctype, getdate(date)), get_month_key(doctype, today)):
+                bucket = buckets.setdefault(key, {})
+                bucket[f"{cstr(company)}:count"] = bucket.get(f"{cstr(company)}:count", 0) + count
+                bucket[f"{cstr(company)}:total"] = bucket.get(f"{cstr(company)}:total", 0) + flt(total)
+
+        # Days without documents still need their stale counters cleared
+        for day in range(1, today.day + 1):
+            buckets.setdefault(get_day_key(doctype, today.replace(day=day)), {})
+
+        for key, actual in buckets.items():
+            expiry = MONTH_KEY_EXPIRY if key == get_month_key(doctype, today) else DAY_KEY_EXPIRY
+            drift.extend(_overwrite(key, actual, expiry))
+
+    gauges = {
+        "pending_quotations": frappe.db.count("Quotation", {"status": "Open", "docstatus": 1}),
+        "overdue_invoices": frappe.db.count(
+            "Sales Invoice",
+            {"due_date": ["<", nowdate()], "outstanding_amount": [">=", 0.01], "docstatus": 1}
+        )
+    }
+    drift.extend(_overwrite(frappe.cache().make_key(GAUGES_KEY), gauges))
+
+    frappe.cache().set(frappe.cache().make_key(READY_KEY), 1)
+    return drift
+
+
+def _overwrite(key, actual, expiry=None):
+    """Replace a counter hash with `actual`, returning the drifted fields"""
+    cache = frappe.cache()
+    current = {cstr(field): flt(value) for field, value in (read_raw("hgetall", key) or {}).items()}
+
+    drift = [
+        {"key": key, "field": field, "counter": current.get(field, 0), "actual": flt(value)}
+        for field, value in actual.items()
+        if round(current.get(field, 0) - flt(value), 2)
+    ]
+    drift.extend(
+        {"key": key, "field": field, "counter": value, "actual": 0}
+        for field, value in current.items()
+        if field not in actual and round(value, 2)
+    )
+
+    pipe = cache.pipeline()
+    pipe.delete(key)
+    if actual:
+        pipe.hset(key, mapping=actual)
+        if expiry:
+            pipe.expire(key, expiry)
+    pipe.execute()
+
+    return drift
@@ -0,0 +1,136 @@
+# ERPMAX Parallel Query Executor
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import frappe
+from frappe.utils import cint
+
+from erpmax import logs
+
+
+# Worker threads per site (site config: erpmax_executor_pool_size)
+DEFAULT_POOL_SIZE = 4
+
+# Shortest wait between deadline checks while a group is being cancelled
+MIN_WAIT = 0.01
+
+# Request-scoped memos that must not leak from one task to the next
+REQUEST_STATE = (
+    "erpmax_cache_generations",
+    "erpmax_event_permissions",
+    "erpmax_low_stock_pending",
+    "erpmax_render_memo",
+    "erpmax_role_memo",
+    "erpmax_session_user",
+    "erpmax_transaction_stats",
+    "erpmax_user_versions"
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(site):
+    """Get the worker pool of a site
+
+    Every worker thread opens its own site connection once and keeps it for
+    the life of the process, so groups never wait on connection setup.
+    """
+    if site not in _pools:
+        with _pools_lock:
+            if site not in _pools:
+                _pools[site] = ThreadPoolExecutor(
+                    max_workers=cint(frappe.conf.get("erpmax_executor_pool_size")) or DEFAULT_POOL_SIZE,
+                    thread_name_prefix=f"erpmax-db-{site}",
+                    initializer=_init_worker,
+                    initargs=(site,)
+                )
+    return _pools[site]
+
+
+def run_groups(groups, user=None):
+    """Run independent query groups concurrently, each with its own deadline
+
+    `groups` maps a group name to `(function, args, deadline_in_seconds)`.
+    Returns `(results, status)` where status is "ok", "timeout" or "error"
+    per group; groups that did not finish have no entry in `results`.
+
+    The pool is shared by every request of the site, so a group's deadline
+    counts from when a worker starts running it, not from submission. A
+    group still queued once the longest deadline has passed is cancelled
+    and reported as "timeout" without running. A timed-out group that
+    already started keeps its worker until it finishes but no longer holds
+    up the caller.
+    """
+    user = user or frappe.session.user
+    pool = get_pool(frappe.local.site)
+    queue_deadline = time.monotonic() + max((deadline for _f, _a, deadline in groups.values()), default=0)
+
+    # Filled in by the workers as they pick groups up
+    started = {}
+
+    def get_deadline(name):
+        if name in started:
+            return started[name] + groups[name][2]
+        return queue_deadline
+
+    pending = {
+        name: pool.submit(_run_in_worker, user, function, args, started, name)
+        for name, (function, args, _deadline) in groups.items()
+    }
+
+    results, status = {}, {}
+    while pending:
+        now = time.monotonic()
+
+        for name, future in list(pending.items()):
+            if future.done():
+                del pending[name]
+                try:
+                    results[name] = future.result()
+                    status[name] = "ok"
+                except Exception as e:
+                    status[name] = "error"
+                    logs.error(f"ERPMAX: query group {name} failed: {str(e)}")
+
+            elif now >= get_deadline(name) and (name in started or future.cancel()):
+                del pending[name]
+                status[name] = "timeout"
+
+        if pending:
+            timeout = min(get_deadline(name) for name in pending) - time.monotonic()
+            wait(pending.values(), timeout=max(timeout, MIN_WAIT), return_when=FIRST_COMPLETED)
+
+    return results, status
+
+
+def _init_worker(site):
+    frappe.init(site=site)
+    frappe.connect()
+
+
+def _run_in_worker(user, function, args, started, name):
+    started[name] = time.monotonic()
+
+    if not frappe.db or not getattr(frappe.db, "_conn", None):
+        frappe.connect()
+
+    _reset_request_state()
+    frappe.set_user(user)
+    try:
+        return function(*args)
+    finally:
+        # End the read transaction so the next group sees fresh data
+        frappe.db.rollback()
+
+
+def _reset_request_state():
+    """Drop the memos a previous task left on this worker's frappe.local"""
+    for attribute in REQUEST_STATE:
+        if hasattr(frappe.local, attribute):
+            delattr(frappe.local, attribute)
+
+    frappe.local.cache = {}
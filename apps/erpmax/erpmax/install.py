@@ -6,6 +6,9 @@ from frappe import _
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 
+from erpmax.activity import backfill_activity_feed
+from erpmax.schema import ensure_tables
+
 
 def after_install():
     """Run after ERPMAX installation"""
@@ -27,6 +30,10 @@ def after_install():
     # Create default user roles
     create_default_roles()
     
+    # Create ERPMAX tables
+    ensure_tables()
+    backfill_activity_feed()
+    
     frappe.logger().info("ERPMAX installation completed successfully!")
     
     # Show success message
@@ -37,6 +44,13 @@ def after_install():
     )
 
 
+def after_migrate():
+    """Run after every migrate"""
+    
+    ensure_tables()
+    backfill_activity_feed()
+
+
 def create_erpmax_custom_fields():
     """Create custom fields for ERPMAX"""
     
@@ -0,0 +1,115 @@
+# ERPMAX Chunked Job Runner
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+
+import frappe
+from frappe.utils import add_to_date, get_datetime, now, now_datetime
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# A checkpoint that made no progress for this long is abandoned and the job
+# starts over. Kept at several times the schedule interval of a daily job, so
+# the next scheduled runs always resume after a timeout.
+DEFAULT_RESUME_WITHIN = 3 * 24 * 3600
+
+
+def run_chunked(job, doctype, process_chunk, fields=("name",), chunk_size=DEFAULT_CHUNK_SIZE,
+                conditions=None, values=None, resume_within=DEFAULT_RESUME_WITHIN):
+    """Process a table in keyset-paginated chunks with a persisted cursor
+
+    Rows are read `chunk_size` at a time in `name` order and handed to
+    `process_chunk(rows)`, which may return a dict of counts to add to the
+    job stats. After every chunk the cursor and stats are written to
+    `tabERPMAX Job Checkpoint` in the same transaction as the chunk's own
+    writes and committed, so a job killed by a timeout resumes after the
+    last committed chunk and memory stays bounded by the chunk size.
+    Returns the accumulated stats.
+    """
+    checkpoint = get_checkpoint(job, resume_within)
+    cursor = checkpoint["cursor"] if checkpoint else ""
+    stats = checkpoint["stats"] if checkpoint else {"rows": 0, "chunks": 0}
+    started = checkpoint["started"] if checkpoint else now()
+    stats["resumed_from"] = cursor or None
+
+    query_values = dict(values or {})
+    query_values["limit"] = chunk_size
+    columns = ", ".join(f"`{field}`" for field in fields)
+    extra_conditions = f"AND ({conditions})" if conditions else ""
+
+    while True:
+        query_values["cursor"] = cursor
+        rows = frappe.db.sql(f"""
+            SELECT {columns}
+            FROM `tab{doctype}`
+            WHERE name > %(cursor)s
+            {extra_conditions}
+            ORDER BY name
+            LIMIT %(limit)s
+        """, query_values, as_dict=True)
+
+        if not rows:
+            break
+
+        for key, value in (process_chunk(rows) or {}).items():
+            stats[key] = stats.get(key, 0) + value
+
+        stats["rows"] += len(rows)
+        stats["chunks"] += 1
+        cursor = rows[-1].name
+
+        save_checkpoint(job, cursor, stats, started)
+        frappe.db.commit()
+
+    clear_checkpoint(job)
+    frappe.db.commit()
+
+    return stats
+
+
+def get_checkpoint(job, resume_within=DEFAULT_RESUME_WITHIN):
+    """Get the resumable checkpoint of a job, if any
+
+    The age is measured from the checkpoint's last progress, so a job that
+    needs several runs keeps resuming as long as each one moves it forward.
+    """
+    rows = frappe.db.sql("""
+        SELECT `cursor`, `stats`, `started`, `modified`
+        FROM `tabERPMAX Job Checkpoint`
+        WHERE job = %s
+    """, [job], as_dict=True)
+
+    if not rows:
+        return None
+
+    if get_datetime(rows[0].modified) < add_to_date(now_datetime(), seconds=-resume_within):
+        return None
+
+    return {
+        "cursor": rows[0].cursor,
+        "stats": json.loads(rows[0].stats or "{}"),
+        "started": rows[0].started
+    }
+
+
+def save_checkpoint(job, cursor, stats, started):
+    frappe.db.sql("""
+        INSERT INTO `tabERPMAX Job Checkpoint` (`job`, `cursor`, `stats`, `started`, `modified`)
+        VALUES (%(job)s, %(cursor)s, %(stats)s, %(started)s, %(modified)s)
+        ON DUPLICATE KEY UPDATE
+            `cursor` = VALUES(`cursor`),
+            `stats` = VALUES(`stats`),
+            `started` = VALUES(`started`),
+            `modified` = VALUES(`modified`)
+    """, {
+        "job": job,
+        "cursor": cursor,
+        "stats": json.dumps({key: value for key, value in stats.items() if key != "resumed_from"}),
+        "started": started,
+        "modified": now()
+    })
+
+
+def clear_checkpoint(job):
+    frappe.db.sql("DELETE FROM `tabERPMAX Job Checkpoint` WHERE job = %s", [job])
@@ -0,0 +1,144 @@
+# ERPMAX Logging Pipeline
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import atexit
+import logging
+import os
+import queue
+import threading
+
+import frappe
+
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class LogPipeline(object):
+    """Bounded in-memory log queue drained in batches by a background thread
+
+    Request threads only enqueue the record; formatting and writing to the
+    log handlers happens on the worker thread. When the queue is full new
+    records are dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.queue = queue.Queue(maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, logger, level, message):
+        """Queue a log record without blocking"""
+        self._ensure_worker()
+
+        try:
+            self.queue.put_nowait((logger, level, message))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Write every queued record from the calling thread"""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                break
+            self._write(batch)
+
+    def shutdown(self):
+        """Stop the worker thread and flush what is left"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(self.flush_interval * 2)
+        self.flush()
+
+    def get_stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "worker_alive": bool(self._thread and self._thread.is_alive())
+        }
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so forked workers start their own
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="erpmax-log-pipeline", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch(block=True)
+            if batch:
+                self._write(batch)
+
+    def _take_batch(self, block):
+        batch = []
+
+        try:
+            batch.append(self.queue.get(block=block, timeout=self.flush_interval if block else None))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return batch
+
+    def _write(self, batch):
+        for logger, level, message in batch:
+            try:
+                logger.log(level, message)
+            except Exception:
+                pass
+
+        with self._lock:
+            self.written += len(batch)
+
+
+pipeline = LogPipeline()
+atexit.register(pipeline.shutdown)
+
+
+def info(message, module=None):
+    """Queue an info record for the ERPMAX log"""
+    pipeline.submit(frappe.logger(module), logging.INFO, message)
+
+
+def warning(message, module=None):
+    """Queue a warning record for the ERPMAX log"""
+    pipeline.submit(frappe.logger(module), logging.WARNING, message)
+
+
+def error(message, module=None):
+    """Queue an error record for the ERPMAX log"""
+    pipeline.submit(frappe.logger(module), logging.ERROR, message)
+
+
+def flush(*args, **kwargs):
+    """Flush queued records, used as the after_job hook of forked workers"""
+    pipeline.flush()
+
+
+@frappe.whitelist()
+def get_log_pipeline_stats():
+    """Get queue depth, written and dropped record counts"""
+    frappe.only_for("System Manager")
+    return pipeline.get_stats()
@@ -1,12 +1,44 @@
 # ERPMAX Notification Configuration
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import hashlib
+import time
+
 import frappe
 from frappe import _
+from frappe.translate import get_user_lang
+from frappe.utils import cint, now
+
+from erpmax import logs
+from erpmax.cache import get_cache_key, get_cached
+from erpmax.conditions import UnsupportedCondition, compile_condition, count_matching
+from erpmax.roles import get_role_set
+from erpmax.stock_index import get_low_stock_count, index_ready
+
+
+# Bump when the configuration below changes, so compiled copies are rebuilt
+NOTIFICATION_CONFIG_VERSION = 2
+
+_notification_configs = {}
+_compiled_conditions = {}
 
 
 def get_notification_config():
-    """Enhanced notification configuration for ERPMAX"""
+    """Enhanced notification configuration for ERPMAX
+    
+    Built once per process, language and config version. The returned dict
+    is shared, so callers must not modify it.
+    """
+    
+    key = (frappe.local.lang, NOTIFICATION_CONFIG_VERSION)
+    if key not in _notification_configs:
+        _notification_configs[key] = build_notification_config()
+    
+    return _notification_configs[key]
+
+
+def build_notification_config():
+    """Build the notification configuration in the current language"""
     
     return {
         "for_doctype": {
@@ -66,7 +98,7 @@ def get_notification_config():
                 "label": _("Stock Alerts"),
                 "conditions": [
                     {
-                        "condition": "stock_level < reorder_level",
+                        "condition": "low_stock_items > 0",
                         "message": _("Items below reorder level"),
                         "alert_type": "warning"
                     }
@@ -142,47 +174,282 @@ def get_notification_config():
     }
 
 
+def get_compiled_conditions():
+    """Get the compiled conditions of the notification configuration
+    
+    Returns `{(section, name): [entry, ...]}` where each entry is the
+    configured condition with its compiled predicate under `compiled` (None
+    for conditions outside the supported subset). Compiled once per
+    language and config version.
+    """
+    
+    key = (frappe.local.lang, NOTIFICATION_CONFIG_VERSION)
+    if key not in _compiled_conditions:
+        _compiled_conditions[key] = compile_notification_config(get_notification_config())
+    
+    return _compiled_conditions[key]
+
+
+def compile_notification_config(config):
+    """Compile every condition of a notification configuration"""
+    
+    compiled = {}
+    
+    for section in ("for_doctype", "for_module", "targets"):
+        for name, settings in (config.get(section) or {}).items():
+            entries = []
+            for entry in settings.get("conditions") or []:
+                if isinstance(entry, str):
+                    entry = {"condition": entry}
+                
+                try:
+                    condition = compile_condition(entry["condition"])
+                except UnsupportedCondition as e:
+                    logs.warning(f"ERPMAX: notification condition not compiled: {str(e)}")
+                    condition = None
+                
+                entries.append(dict(entry, compiled=condition))
+            
+            compiled[(section, name)] = entries
+    
+    return compiled
+
+
+def get_module_alerts(module, context):
+    """Get the module alerts whose conditions hold for `context`, e.g. the shared counts"""
+    
+    return [
+        {"message": entry["message"], "alert_type": entry["alert_type"], "label": module}
+        for entry in get_compiled_conditions().get(("for_module", module), [])
+        if entry["compiled"] is not None and entry["compiled"].predicate({}, context)
+    ]
+
+
+# How a matched module alert is shown: the context count it reports and
+# the document type it links to
+MODULE_NOTIFICATIONS = {
+    "Accounts": {
+        "count": "overdue_invoices",
+        "doctype": "Sales Invoice",
+        "title": "Overdue Invoices",
+        "message": "{0} invoices are overdue"
+    },
+    "Stock": {
+        "count": "low_stock_items",
+        "doctype": "Item",
+        "title": "Low Stock Alert",
+        "message": "{0} items are below reorder level"
+    },
+    "Selling": {
+        "count": "pending_quotations",
+        "doctype": "Quotation",
+        "title": "Pending Quotations",
+        "message": "{0} quotations are pending response"
+    }
+}
+
+
+# Freshness bound of a notification bundle (site config: erpmax_notification_ttl)
+DEFAULT_BUNDLE_TTL = 300
+
+# The last bundle outlives the current one, covering the gap until the refresher runs
+LAST_BUNDLE_TTL_FACTOR = 3
+
+# Users polling within this window get their bundles refreshed in the background
+ACTIVE_USER_WINDOW = 900
+ACTIVE_USERS_KEY = "erpmax:notifications:active_users"
+
+
 @frappe.whitelist()
 def get_notifications_for_user(user=None):
-    """Get notifications for specific user"""
+    """Get notifications for specific user
+    
+    Polling reads precomputed bundles. Once a bundle expires the last
+    bundle for the same role set is served until the background refresher
+    has rebuilt it; a user without any bundle gets one built on this poll.
+    """
     
     if not user:
         user = frappe.session.user
     
+    mark_user_active(user)
+    
+    bundle = frappe.cache().get_value(get_bundle_key(user))
+    if bundle is None:
+        bundle = frappe.cache().get_value(get_last_bundle_key(user))
+        if bundle is None:
+            bundle = refresh_user_bundle(user)
+    
+    return bundle["notifications"]
+
+
+def get_bundle_ttl():
+    return cint(frappe.conf.get("erpmax_notification_ttl")) or DEFAULT_BUNDLE_TTL
+
+
+def get_bundle_key(user):
+    """Get the bundle key of a user, covering generation, user version and role set"""
+    return f"{get_cache_key('notifications', user)}:{get_role_signature(user)}"
+
+
+def get_last_bundle_key(user):
+    """Get the fallback bundle key of a user, so a role change never serves the old bundle"""
+    return f"erpmax:notifications:last:{user}:{get_role_signature(user)}"
+
+
+def get_role_signature(user):
+    return hashlib.md5("\n".join(sorted(get_role_set(user))).encode()).hexdigest()[:12]
+
+
+def mark_user_active(user):
+    frappe.cache().zadd(frappe.cache().make_key(ACTIVE_USERS_KEY), {user: time.time()})
+
+
+def get_active_users():
+    """Get users that polled notifications recently"""
+    key = frappe.cache().make_key(ACTIVE_USERS_KEY)
+    cutoff = time.time() - ACTIVE_USER_WINDOW
+    
+    frappe.cache().zremrangebyscore(key, "-inf", cutoff)
+    return [frappe.safe_decode(user) for user in frappe.cache().zrangebyscore(key, cutoff, "+inf")]
+
+
+def refresh_user_bundle(user):
+    """Build and store the notification bundle of a user"""
+    
+    lang = frappe.local.lang
+    frappe.local.lang = get_user_lang(user)
+    
+    try:
+        bundle = {
+            "notifications": build_notifications_for_user(user),
+            "timestamp": now()
+        }
+    finally:
+        frappe.local.lang = lang
+    
+    frappe.cache().set_value(get_bundle_key(user), bundle, expires_in_sec=get_bundle_ttl())
+    frappe.cache().set_value(
+        get_last_bundle_key(user), bundle, expires_in_sec=get_bundle_ttl() * LAST_BUNDLE_TTL_FACTOR
+    )
+    
+    return bundle
+
+
+def refresh_notification_bundles():
+    """Background refresher rebuilding the shared part and missing bundles"""
+    
+    refreshed = 0
+    get_shared_notification_data()
+    
+    for user in get_active_users():
+        if frappe.cache().get_value(get_bundle_key(user)) is None:
+            refresh_user_bundle(user)
+            refreshed += 1
+    
+    return refreshed
+
+
+def get_shared_notification_data():
+    """Get the user-independent notification counts, computed once for all users"""
+    
+    return get_cached("notifications_shared", lambda: {
+        "overdue_invoices": frappe.db.count(
+            "Sales Invoice",
+            {
+                "due_date": ["<", frappe.utils.nowdate()],
+                "outstanding_amount": [">=", 0.01],
+                "docstatus": 1
+            }
+        ),
+        "low_stock_items": get_low_stock_items(),
+        "pending_quotations": get_pending_quotations_count(),
+        "doctype_alerts": get_doctype_alert_counts()
+    })
+
+
+def get_doctype_alert_counts():
+    """Count the documents matching each enabled doctype alert condition
+    
+    Doctype alerts are off unless listed in the `erpmax_doctype_alerts` site
+    config, e.g. `["Sales Order"]`: counts are site-wide, so only enable
+    doctypes whose readers may see them. Only documents in the configured
+    `status` are counted, where the doctype has one. Returns
+    `{doctype: [count, ...]}`, one count per configured condition in order,
+    so messages are rendered in each user's language. Conditions that are
+    not compiled, need a context or use missing columns count as 0.
+    """
+    
+    counts = {}
+    enabled = set(frappe.conf.get("erpmax_doctype_alerts") or [])
+    
+    for (section, doctype), entries in get_compiled_conditions().items():
+        if section != "for_doctype" or doctype not in enabled:
+            continue
+        
+        # Cancelled documents never alert, drafts only for non-submittable doctypes
+        conditions = "docstatus = 1" if frappe.get_meta(doctype).is_submittable else "docstatus < 2"
+        status = get_notification_config()["for_doctype"][doctype].get("status")
+        if status and frappe.db.has_column(doctype, "status"):
+            conditions += f" AND status = {frappe.db.escape(status)}"
+        
+        counts[doctype] = []
+        
+        for entry in entries:
+            condition = entry["compiled"]
+            if (
+                condition is None
+                or condition.uses_context
+                or not all(frappe.db.has_column(doctype, field) for field in condition.fields)
+            ):
+                counts[doctype].append(0)
+                continue
+            
+            counts[doctype].append(count_matching(doctype, condition, conditions))
+    
+    return counts
+
+
+def build_notifications_for_user(user):
+    """Build notifications for specific user"""
+    
     notifications = []
+    shared = get_shared_notification_data()
     
-    # Get overdue invoices
-    overdue_invoices = get_overdue_invoices_for_user(user)
-    if overdue_invoices:
-        notifications.append({
-            "type": "danger",
-            "title": _("Overdue Invoices"),
-            "message": _(f"{overdue_invoices} invoices are overdue"),
-            "doctype": "Sales Invoice",
-            "count": overdue_invoices
-        })
-    
-    # Get low stock items
-    low_stock_items = get_low_stock_items()
-    if low_stock_items:
-        notifications.append({
-            "type": "warning",
-            "title": _("Low Stock Alert"),
-            "message": _(f"{low_stock_items} items are below reorder level"),
-            "doctype": "Item",
-            "count": low_stock_items
-        })
-    
-    # Get pending quotations
-    pending_quotations = get_pending_quotations_count()
-    if pending_quotations > 5:
-        notifications.append({
-            "type": "info",
-            "title": _("Pending Quotations"),
-            "message": _(f"{pending_quotations} quotations are pending response"),
-            "doctype": "Quotation",
-            "count": pending_quotations
-        })
+    # Module alerts, checked against the counts this user sees
+    context = {
+        "overdue_invoices": get_overdue_invoices_for_user(user),
+        "low_stock_items": shared["low_stock_items"],
+        "pending_quotations": shared["pending_quotations"]
+    }
+    
+    for module, settings in MODULE_NOTIFICATIONS.items():
+        alerts = get_module_alerts(module, context)
+        if alerts:
+            count = context[settings["count"]]
+            notifications.append({
+                "type": alerts[0]["alert_type"],
+                "title": _(settings["title"]),
+                "message": _(settings["message"]).format(count),
+                "doctype": settings["doctype"],
+                "count": count
+            })
+    
+    # Doctype alerts enabled in site config, for doctypes the user can read
+    for doctype, counts in (shared.get("doctype_alerts") or {}).items():
+        if not any(counts) or not frappe.has_permission(doctype, "read", user=user):
+            continue
+        
+        entries = get_compiled_conditions().get(("for_doctype", doctype), [])
+        for entry, count in zip(entries, counts):
+            if count:
+                notifications.append({
+                    "type": entry["alert_type"],
+                    "title": entry["message"],
+                    "message": _("{0} {1} documents").format(count, _(doctype)),
+                    "doctype": doctype,
+                    "count": count
+                })
     
     # Get user-specific notifications
     user_notifications = get_user_specific_notifications(user)
@@ -194,18 +461,11 @@ def get_notifications_for_user(user=None):
 def get_overdue_invoices_for_user(user):
     """Get overdue invoices count for user"""
     
-    user_roles = frappe.get_roles(user)
+    user_roles = get_role_set(user)
     
     # If user is sales manager, show all overdue invoices
     if "Sales Manager" in user_roles or "Accounts Manager" in user_roles:
-        return frappe.db.count(
-            "Sales Invoice",
-            {
-                "due_date": ["<", frappe.utils.nowdate()],
-                "outstanding_amount": [">=", 0.01],
-                "docstatus": 1
-            }
-        )
+        return get_shared_notification_data()["overdue_invoices"]
     
     # Otherwise show only user's invoices
     return frappe.db.count(
@@ -222,6 +482,9 @@ def get_overdue_invoices_for_user(user):
 def get_low_stock_items():
     """Get count of items with low stock"""
     
+    if index_ready():
+        return get_low_stock_count()
+    
     return frappe.db.sql("""
         SELECT COUNT(*) FROM `tabBin` b
         JOIN `tabItem` i ON b.item_code = i.item_code
@@ -318,7 +581,7 @@ def mark_notification_as_read(notification_id):
     # Implementation for marking notifications as read
     # This would typically update a user preference or log table
     
-    frappe.logger().info(f"Notification {notification_id} marked as read by {frappe.session.user}")
+    logs.info(f"Notification {notification_id} marked as read by {frappe.session.user}")
     
     return {"status": "success"}
 
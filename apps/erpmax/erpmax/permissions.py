@@ -0,0 +1,88 @@
+# ERPMAX Permission Query Conditions
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+from erpmax.roles import ERPMAX_MANAGER_ROLE, get_role_set
+
+
+# Read conditions per doctype: users with an unrestricted role see every
+# document, others see documents matching any of the conditions. `{user}`
+# stands for the user the conditions are built for.
+PERMISSION_RULES = {
+    "Event": {
+        "unrestricted_roles": (ERPMAX_MANAGER_ROLE,),
+        "conditions": (
+            "`tabEvent`.owner = {user}",
+            "`tabEvent`.event_type = 'Public'",
+            """EXISTS (
+                SELECT 1 FROM `tabEvent User`
+                WHERE `tabEvent User`.parent = `tabEvent`.name
+                AND `tabEvent User`.user = {user}
+            )"""
+        )
+    }
+}
+
+# MariaDB session variable holding the session user. It is only ever bound
+# to `frappe.session.user`, so conditions built with it stay valid however
+# late the query they are part of runs.
+USER_VARIABLE = "@erpmax_user"
+
+_compiled = {}
+
+
+def get_permission_query_conditions(doctype, user=None):
+    """Get the read conditions of a doctype for a user
+
+    On MariaDB, conditions for the session user only depend on the role
+    set: the user is bound through a session variable, so every user shares
+    the same statement text and nothing user-supplied is formatted into SQL.
+    Conditions built for another user (e.g. `frappe.get_list(user=...)`) and
+    other databases get the user as an escaped literal, so a query never
+    depends on whichever user the variable was last bound to.
+    """
+    user = user or frappe.session.user
+    template = compile_conditions(doctype, get_role_set(user))
+
+    if not template:
+        return template
+
+    if frappe.db.db_type == "mariadb" and user == frappe.session.user:
+        set_session_user(user)
+        return template.replace("{user}", USER_VARIABLE)
+
+    return template.replace("{user}", frappe.db.escape(user))
+
+
+def compile_conditions(doctype, role_set):
+    """Compile the conditions of a doctype for a role set, once per process"""
+    key = (doctype, role_set)
+
+    if key not in _compiled:
+        rule = PERMISSION_RULES[doctype]
+
+        if any(role in role_set for role in rule["unrestricted_roles"]):
+            _compiled[key] = ""
+        else:
+            _compiled[key] = "(\n" + "\n    OR ".join(rule["conditions"]) + "\n)"
+
+    return _compiled[key]
+
+
+def set_session_user(user):
+    """Bind the session variable to `user`, skipping the round trip if it already is
+
+    Tracked per connection, since the variable lives on the connection.
+    Only `frappe.session.user` may be bound.
+    """
+    if user != frappe.session.user:
+        frappe.throw(f"{USER_VARIABLE} can only be bound to the session user")
+
+    connection = getattr(frappe.db, "_conn", None)
+
+    if connection is None or getattr(frappe.local, "erpmax_session_user", None) != (id(connection), user):
+        frappe.db.sql(
+            f"SET {USER_VARIABLE} = CONVERT(%s USING utf8mb4) COLLATE utf8mb4_unicode_ci", [user]
+        )
+        frappe.local.erpmax_session_user = (id(frappe.db._conn), user)
@@ -0,0 +1,194 @@
+# ERPMAX Log and File Purge
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import time
+
+import frappe
+from frappe.utils import add_days, cint, now_datetime
+
+
+# Rows older than `days` (by `date_field`) matching `conditions` are deleted,
+# with the rows of the `children` tables that belong to them. Keys are table
+# names without the `tab` prefix so archive tables can have rules too.
+# Override per table with the `erpmax_log_retention` site config.
+LOG_RETENTION = {
+    "Scheduled Job Log": {"days": 30},
+    "Access Log": {"days": 90},
+    "Route History": {"days": 90},
+    "Email Queue": {
+        "days": 30,
+        "conditions": "status IN ('Sent', 'Expired', 'Cancelled')",
+        "children": {"Email Queue Recipient": "parent"}
+    },
+    "Archived Error Log": {"days": 365},
+    "Archived Activity Log": {"days": 730}
+}
+
+# Temporary and staging directories: every file older than `days` is removed.
+# Override per directory with the `erpmax_file_retention` site config.
+FILE_RETENTION = {
+    "private/temp": {"days": 1},
+    "public/temp": {"days": 1}
+}
+
+# Attachment directories, only purged of files no File record points to when
+# the `erpmax_purge_orphan_files` site config is set. Files can be referenced
+# from HTML fields, letter heads, web pages and print formats without a File
+# record, so this is opt-in.
+ORPHAN_FILE_RETENTION = {
+    "private/files": {"days": 30, "url_prefix": "/private/files/"},
+    "public/files": {"days": 30, "url_prefix": "/files/"}
+}
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAUSE = 0.5
+
+
+def get_rules(defaults, conf_key):
+    rules = {key: dict(rule) for key, rule in defaults.items()}
+
+    for key, rule in (frappe.conf.get(conf_key) or {}).items():
+        if rule:
+            rules.setdefault(key, {}).update(rule)
+        else:
+            rules.pop(key, None)
+
+    return rules
+
+
+def purge_logs(dry_run=False, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE):
+    """Delete log rows past their retention, in batches with a pause in between
+
+    Returns `{table: {"rows": n, "bytes": n}}`. Bytes are estimated from the
+    table's average row length. With `dry_run` nothing is deleted and the
+    figures are what a real run would reclaim.
+    """
+    report = {}
+
+    for table, rule in get_rules(LOG_RETENTION, "erpmax_log_retention").items():
+        if not frappe.db.table_exists(table):
+            continue
+
+        cutoff = add_days(now_datetime(), -cint(rule["days"]))
+        conditions = f"{rule.get('date_field', 'creation')} < %(cutoff)s"
+        if rule.get("conditions"):
+            conditions += f" AND ({rule['conditions']})"
+
+        if dry_run:
+            rows = frappe.db.sql(
+                f"SELECT COUNT(*) FROM `tab{table}` WHERE {conditions}", {"cutoff": cutoff}
+            )[0][0]
+        else:
+            rows = _delete_in_batches(table, conditions, cutoff, rule.get("children") or {}, batch_size, pause)
+
+        report[table] = {"rows": rows, "bytes": rows * get_average_row_length(table)}
+
+    return report
+
+
+def _delete_in_batches(table, conditions, cutoff, children, batch_size, pause):
+    deleted = 0
+
+    while True:
+        names = frappe.db.sql_list(f"""
+            SELECT name FROM `tab{table}`
+            WHERE {conditions}
+            LIMIT %(limit)s
+        """, {"cutoff": cutoff, "limit": batch_size})
+
+        if not names:
+            break
+
+        for child_table, parent_field in children.items():
+            frappe.db.sql(
+                f"DELETE FROM `tab{child_table}` WHERE `{parent_field}` IN %(names)s",
+                {"names": tuple(names)}
+            )
+        frappe.db.sql(f"DELETE FROM `tab{table}` WHERE name IN %(names)s", {"names": tuple(names)})
+
+        frappe.db.commit()
+        deleted += len(names)
+        time.sleep(pause)
+
+    return deleted
+
+
+def get_average_row_length(table):
+    return cint(frappe.db.sql("""
+        SELECT avg_row_length
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+        AND table_name = %s
+    """, [f"tab{table}"])[0][0])
+
+
+def purge_files(dry_run=True, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE):
+    """Delete old files from temporary directories, and opted-in orphans
+
+    Nothing is deleted unless `dry_run` is False. Returns
+    `{directory: {"files": n, "bytes": n}}`.
+    """
+    rules = get_rules(FILE_RETENTION, "erpmax_file_retention")
+    if frappe.conf.get("erpmax_purge_orphan_files"):
+        rules.update(ORPHAN_FILE_RETENTION)
+
+    report = {}
+
+    for directory, rule in rules.items():
+        path = frappe.get_site_path(*directory.split("/"))
+        if not os.path.isdir(path):
+            continue
+
+        cutoff = time.time() - cint(rule["days"]) * 86400
+        report[directory] = {"files": 0, "bytes": 0}
+
+        for batch in _iter_old_files(path, cutoff, batch_size):
+            if rule.get("url_prefix"):
+                batch = _get_orphans(batch, rule["url_prefix"])
+
+            for entry in batch:
+                report[directory]["files"] += 1
+                report[directory]["bytes"] += entry.stat().st_size
+                if not dry_run:
+                    os.remove(entry.path)
+
+            if not dry_run:
+                time.sleep(pause)
+
+    return report
+
+
+def _iter_old_files(path, cutoff, batch_size):
+    batch = []
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+    if batch:
+        yield batch
+
+
+def _get_orphans(entries, url_prefix):
+    urls = {url_prefix + entry.name: entry for entry in entries}
+    referenced = set(frappe.db.sql_list(
+        "SELECT file_url FROM `tabFile` WHERE file_url IN %(urls)s", {"urls": tuple(urls)}
+    ))
+
+    return [entry for url, entry in urls.items() if url not in referenced]
+
+
+@frappe.whitelist()
+def estimate_purge():
+    """Estimate what the next log and file purge would reclaim"""
+    frappe.only_for("System Manager")
+
+    return {
+        "logs": purge_logs(dry_run=True),
+        "files": purge_files(dry_run=True)
+    }
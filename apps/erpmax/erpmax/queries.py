@@ -3,28 +3,38 @@
 from __future__ import unicode_literals
 import frappe
 from frappe import _
-from frappe.utils import nowdate, add_days, get_datetime
+from frappe.utils import nowdate, add_days, get_datetime, get_first_day
+
+from erpmax import rollups
+from erpmax.activity import get_activity_feed
+from erpmax.counters import (
+    counters_ready,
+    get_day_count,
+    get_gauge,
+    get_month_count,
+    get_month_total,
+)
+from erpmax.executor import run_groups
+from erpmax.permissions import get_permission_query_conditions
+from erpmax.roles import has_role, is_erpmax_manager
+from erpmax.snapshots import (
+    enqueue_snapshot_refresh,
+    get_snapshot,
+    get_snapshot_section,
+    peek_snapshot,
+)
+from erpmax.stats import get_purchase_stats, get_sales_stats, get_transaction_stats
+from erpmax.user_stats import get_documents_created, get_login_count
 
 
 def get_permission_query_conditions_for_event(user):
-    """Enhanced permission query for events in ERPMAX"""
+    """Enhanced permission query for events in ERPMAX
     
-    if not user:
-        user = frappe.session.user
+    ERPMAX managers see all events; other users see their own events, public
+    events and events they participate in.
+    """
     
-    # ERPMAX managers can see all events
-    if "ERPMAX Manager" in frappe.get_roles(user):
-        return ""
-    
-    # Regular users can see their own events and public events
-    return f"""(
-        `tabEvent`.owner = '{user}' 
-        OR `tabEvent`.event_type = 'Public'
-        OR `tabEvent`.name in (
-            SELECT parent FROM `tabEvent User` 
-            WHERE `tabEvent User`.user = '{user}'
-        )
-    )"""
+    return get_permission_query_conditions("Event", user)
 
 
 def has_permission(doc, user):
@@ -34,8 +44,7 @@ def has_permission(doc, user):
         user = frappe.session.user
     
     # System Manager and ERPMAX Manager have full access
-    user_roles = frappe.get_roles(user)
-    if "System Manager" in user_roles or "ERPMAX Manager" in user_roles:
+    if is_erpmax_manager(user) or has_role(user, "System Manager"):
         return True
     
     # Check document-specific permissions
@@ -58,13 +67,61 @@ def has_event_permission(doc, user):
         return True
     
     # Check if user is in event participants
-    participants = frappe.get_all(
-        "Event User",
-        filters={"parent": doc.name, "user": user},
-        fields=["user"]
-    )
+    return get_event_permissions([doc.name], user)[doc.name]
+
+
+EVENT_PERMISSION_BATCH_SIZE = 1000
+
+
+def get_event_permissions(event_names, user=None):
+    """Check read access of a user to many Events at once
+    
+    Ownership, visibility and participation are resolved with one query per
+    1000 events and remembered for the rest of the request, so list and
+    calendar views no longer query `tabEvent User` once per event.
+    Returns a `{event name: bool}` map.
+    """
+    
+    if not user:
+        user = frappe.session.user
+    
+    names = list(dict.fromkeys(event_names))
+    
+    if is_erpmax_manager(user) or has_role(user, "System Manager"):
+        return dict.fromkeys(names, True)
+    
+    permissions = _get_event_permission_cache(user)
+    missing = [name for name in names if name not in permissions]
+    
+    for start in range(0, len(missing), EVENT_PERMISSION_BATCH_SIZE):
+        batch = missing[start:start + EVENT_PERMISSION_BATCH_SIZE]
+        
+        rows = frappe.db.sql("""
+            SELECT e.name, e.owner, e.event_type, COUNT(eu.name)
+            FROM `tabEvent` e
+            LEFT JOIN `tabEvent User` eu
+                ON eu.parent = e.name AND eu.user = %(user)s
+            WHERE e.name IN %(names)s
+            GROUP BY e.name, e.owner, e.event_type
+        """, {"user": user, "names": tuple(batch)})
+        
+        for name, owner, event_type, participations in rows:
+            permissions[name] = owner == user or event_type == "Public" or participations > 0
+        
+        # Events that do not exist are not accessible
+        for name in batch:
+            permissions.setdefault(name, False)
+    
+    return {name: permissions[name] for name in names}
+
+
+def _get_event_permission_cache(user):
+    """Get the request-scoped `{event name: bool}` cache of a user"""
+    
+    if not hasattr(frappe.local, "erpmax_event_permissions"):
+        frappe.local.erpmax_event_permissions = {}
     
-    return len(participants) > 0
+    return frappe.local.erpmax_event_permissions.setdefault(user, {})
 
 
 @frappe.whitelist()
@@ -74,19 +131,20 @@ def get_dashboard_data(user=None):
     if not user:
         user = frappe.session.user
     
+    if frappe.conf.get("erpmax_dashboard_parallel"):
+        return get_dashboard_data_parallel(user)
+    
+    # Global aggregates are served from the dashboard snapshot
+    snapshot = get_snapshot()
+    
     # Base dashboard data
-    data = {
-        "customers": frappe.db.count("Customer"),
-        "suppliers": frappe.db.count("Supplier"),
-        "items": frappe.db.count("Item"),
-        "users": frappe.db.count("User", {"enabled": 1})
-    }
+    data = dict(snapshot["counts"])
     
     # Sales data
-    data.update(get_sales_data())
+    data.update(snapshot["sales"])
     
     # Purchase data
-    data.update(get_purchase_data())
+    data.update(snapshot["purchase"])
     
     # Recent activities
     data["recent_activities"] = get_recent_activities(user)
@@ -94,59 +152,113 @@ def get_dashboard_data(user=None):
     # User-specific data
     data["user_stats"] = get_user_stats(user)
     
+    data["snapshot_time"] = snapshot["timestamp"]
+    
     return data
 
 
-def get_sales_data():
-    """Get sales statistics"""
+# Per-group deadlines in seconds (site config: erpmax_dashboard_deadlines)
+DASHBOARD_GROUP_DEADLINES = {
+    "counts": 2.0,
+    "sales": 2.0,
+    "purchase": 2.0,
+    "recent_activities": 1.0,
+    "user_stats": 1.0
+}
+
+
+def get_dashboard_data_parallel(user):
+    """Get dashboard data running independent query groups concurrently
+    
+    Per-user groups always run; global sections only run when the snapshot
+    is stale or missing. A group that misses its deadline does not fail the
+    request: its section falls back to the stale snapshot or is left out,
+    and `sections` reports "fresh", "stale" or "missing" for each of them.
+    """
     
-    today = nowdate()
-    month_start = today.replace(day=1)
+    deadlines = dict(DASHBOARD_GROUP_DEADLINES)
+    deadlines.update(frappe.conf.get("erpmax_dashboard_deadlines") or {})
+    
+    groups = {
+        "recent_activities": (get_recent_activities, (user,), deadlines["recent_activities"]),
+        "user_stats": (get_user_stats, (user,), deadlines["user_stats"])
+    }
+    
+    snapshot, is_fresh = peek_snapshot()
+    if not is_fresh:
+        enqueue_snapshot_refresh()
+        groups.update({
+            "counts": (get_global_counts, (), deadlines["counts"]),
+            "sales": (get_sales_data, (), deadlines["sales"]),
+            "purchase": (get_purchase_data, (), deadlines["purchase"])
+        })
+    
+    results, status = run_groups(groups, user)
+    
+    data, sections = {}, {}
+    for section in ("counts", "sales", "purchase"):
+        if is_fresh:
+            data.update(snapshot[section])
+            sections[section] = "fresh"
+        elif section in results:
+            data.update(results[section])
+            sections[section] = "fresh"
+        elif snapshot:
+            data.update(snapshot[section])
+            sections[section] = "stale"
+        else:
+            sections[section] = "missing"
+    
+    for section in ("recent_activities", "user_stats"):
+        if section in results:
+            data[section] = results[section]
+            sections[section] = "fresh"
+        else:
+            sections[section] = "missing"
+    
+    data["sections"] = sections
+    data["snapshot_time"] = snapshot["timestamp"] if snapshot else None
+    
+    return data
+
+
+def get_global_counts():
+    """Get master data counts"""
     
     return {
-        "sales_orders_today": frappe.db.count(
-            "Sales Order",
-            {"transaction_date": today, "docstatus": 1}
-        ),
-        "sales_orders_month": frappe.db.count(
-            "Sales Order",
-            {"transaction_date": [">=", month_start], "docstatus": 1}
-        ),
-        "sales_invoices_today": frappe.db.count(
-            "Sales Invoice",
-            {"posting_date": today, "docstatus": 1}
-        ),
-        "sales_invoices_month": frappe.db.count(
-            "Sales Invoice",
-            {"posting_date": [">=", month_start], "docstatus": 1}
-        )
+        "customers": frappe.db.count("Customer"),
+        "suppliers": frappe.db.count("Supplier"),
+        "items": frappe.db.count("Item"),
+        "users": frappe.db.count("User", {"enabled": 1})
     }
 
 
+def get_sales_data():
+    """Get sales statistics"""
+    
+    if counters_ready():
+        return {
+            "sales_orders_today": get_day_count("Sales Order"),
+            "sales_orders_month": get_month_count("Sales Order"),
+            "sales_invoices_today": get_day_count("Sales Invoice"),
+            "sales_invoices_month": get_month_count("Sales Invoice")
+        }
+    
+    return get_sales_stats()
+
+
 def get_purchase_data():
     """Get purchase statistics"""
     
-    today = nowdate()
-    month_start = today.replace(day=1)
+    if counters_ready():
+        return {
+            "purchase_orders_today": get_day_count("Purchase Order"),
+            "purchase_orders_month": get_month_count("Purchase Order"),
+            "purchase_invoices_today": get_day_count("Purchase Invoice"),
+            "purchase_invoices_month": get_month_count("Purchase Invoice")
+        }
     
-    return {
-        "purchase_orders_today": frappe.db.count(
-            "Purchase Order",
-            {"transaction_date": today, "docstatus": 1}
-        ),
-        "purchase_orders_month": frappe.db.count(
-            "Purchase Order",
-            {"transaction_date": [">=", month_start], "docstatus": 1}
-        ),
-        "purchase_invoices_today": frappe.db.count(
-            "Purchase Invoice",
-            {"posting_date": today, "docstatus": 1}
-        ),
-        "purchase_invoices_month": frappe.db.count(
-            "Purchase Invoice",
-            {"posting_date": [">=", month_start], "docstatus": 1}
-        )
-    }
+    return get_purchase_stats()
 
 
 def get_recent_activities(user, limit=10):
@@ -154,44 +266,15 @@ def get_recent_activities(user, limit=10):
     
     activities = []
     
-    # Get recent documents created by user
-    recent_docs = frappe.db.sql("""
-        SELECT 
-            creation,
-            modified,
-            owner,
-            modified_by,
-            doctype,
-            name
-        FROM (
-            SELECT creation, modified, owner, modified_by, 'Sales Order' as doctype, name
-            FROM `tabSales Order` 
-            WHERE owner = %(user)s OR modified_by = %(user)s
-            
-            UNION ALL
-            
-            SELECT creation, modified, owner, modified_by, 'Customer' as doctype, name
-            FROM `tabCustomer`
-            WHERE owner = %(user)s OR modified_by = %(user)s
-            
-            UNION ALL
-            
-            SELECT creation, modified, owner, modified_by, 'Item' as doctype, name
-            FROM `tabItem`
-            WHERE owner = %(user)s OR modified_by = %(user)s
-        ) as combined
-        ORDER BY modified DESC
-        LIMIT %(limit)s
-    """, {"user": user, "limit": limit}, as_dict=True)
-    
-    for doc in recent_docs:
+    # Read the user's activity feed (single indexed range read)
+    for entry in get_activity_feed(user, limit):
         activities.append({
             "type": "document",
-            "doctype": doc.doctype,
-            "name": doc.name,
-            "action": "created" if doc.owner == user else "modified",
-            "timestamp": doc.modified,
-            "user": doc.modified_by
+            "doctype": entry.reference_doctype,
+            "name": entry.reference_name,
+            "action": entry.action,
+            "timestamp": entry.modified,
+            "user": entry.modified_by
         })
     
     return activities
@@ -201,27 +284,9 @@ def get_user_stats(user):
     """Get user-specific statistics"""
     
     return {
-        "documents_created_today": frappe.db.sql("""
-            SELECT COUNT(*) FROM (
-                SELECT name FROM `tabSales Order` WHERE owner = %(user)s AND DATE(creation) = %(today)s
-                UNION ALL
-                SELECT name FROM `tabCustomer` WHERE owner = %(user)s AND DATE(creation) = %(today)s
-                UNION ALL
-                SELECT name FROM `tabItem` WHERE owner = %(user)s AND DATE(creation) = %(today)s
-                UNION ALL
-                SELECT name FROM `tabSupplier` WHERE owner = %(user)s AND DATE(creation) = %(today)s
-            ) as combined
-        """, {"user": user, "today": nowdate()})[0][0] or 0,
+        "documents_created_today": get_documents_created(user),
         
-        "login_count_month": frappe.db.count(
-            "Activity Log",
-            {
-                "user": user,
-                "status": "Success",
-                "operation": "Login",
-                "creation": [">=", nowdate().replace(day=1)]
-            }
-        ),
+        "login_count_month": get_login_count(user, get_first_day(nowdate())),
         
         "last_login": frappe.db.get_value("User", user, "last_login")
     }
@@ -231,6 +296,12 @@ def get_user_stats(user):
 def get_quick_stats():
     """Get quick statistics for ERPMAX dashboard"""
     
+    return get_snapshot_section("quick_stats")
+
+
+def build_quick_stats():
+    """Build quick statistics"""
+    
     return {
         "total_revenue_month": get_monthly_revenue(),
         "total_orders_month": get_monthly_orders(),
@@ -244,32 +315,27 @@ def get_quick_stats():
 def get_monthly_revenue():
     """Get current month revenue"""
     
-    month_start = nowdate().replace(day=1)
+    if counters_ready():
+        return get_month_total("Sales Invoice")
     
-    revenue = frappe.db.sql("""
-        SELECT COALESCE(SUM(grand_total), 0) as revenue
-        FROM `tabSales Invoice`
-        WHERE docstatus = 1 
-        AND posting_date >= %s
-    """, [month_start])[0][0] or 0
-    
-    return float(revenue)
+    return get_transaction_stats()["Sales Invoice"]["month_total"]
 
 
 def get_monthly_orders():
     """Get current month orders count"""
     
-    month_start = nowdate().replace(day=1)
+    if counters_ready():
+        return get_month_count("Sales Order")
     
-    return frappe.db.count(
-        "Sales Order",
-        {"transaction_date": [">=", month_start], "docstatus": 1}
-    )
+    return get_transaction_stats()["Sales Order"]["month"]
 
 
 def get_top_customers(limit=5):
     """Get top customers by revenue"""
     
+    if rollups.rollups_ready():
+        return rollups.get_top_customers(add_days(nowdate(), -90), limit)
+    
     customers = frappe.db.sql("""
         SELECT 
             customer,
@@ -290,6 +356,9 @@ def get_top_customers(limit=5):
 def get_top_items(limit=5):
     """Get top selling items"""
     
+    if rollups.rollups_ready():
+        return rollups.get_top_items(add_days(nowdate(), -30), limit)
+    
     items = frappe.db.sql("""
         SELECT 
             sii.item_code,
@@ -311,20 +380,16 @@ def get_top_items(limit=5):
 def get_pending_quotations():
     """Get pending quotations count"""
     
-    return frappe.db.count(
-        "Quotation",
-        {"status": "Open", "docstatus": 1}
-    )
+    if counters_ready():
+        return get_gauge("pending_quotations")
+    
+    return get_transaction_stats()["Quotation"]["open"]
 
 
 def get_overdue_invoices():
     """Get overdue invoices count"""
     
-    return frappe.db.count(
-        "Sales Invoice",
-        {
-            "due_date": ["<", nowdate()],
-            "outstanding_amount": [">=", 0.01],
-            "docstatus": 1
-        }
-    )
+    if counters_ready():
+        return get_gauge("overdue_invoices")
+    
+    return get_transaction_stats()["Sales Invoice"]["open"]
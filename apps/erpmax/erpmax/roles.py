@@ -0,0 +1,128 @@
+# ERPMAX Role Lookups
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import threading
+
+import frappe
+
+from erpmax.cache import bump_user_version, get_cached
+from erpmax.utils import read_raw
+
+
+ERPMAX_MANAGER_ROLE = "ERPMAX Manager"
+ERPMAX_ACCESS_ROLES = ("ERPMAX Manager", "ERPMAX User", "System Manager")
+
+STATS_KEY = "erpmax:role_cache_stats"
+STATS_FLUSH_EVERY = 100
+
+_stats = {"request_hits": 0, "cache_hits": 0, "misses": 0}
+_pending_stats = {"request_hits": 0, "cache_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_roles(user=None):
+    """Get the roles of a user
+
+    Lookups are memoized for the request and backed by the cache registry
+    under the user's version, so a request resolves each user's roles once
+    and `frappe.get_roles` only runs after the user's roles changed.
+    """
+    return _get_role_info(user)["roles"]
+
+
+def get_role_set(user=None):
+    """Get the roles of a user as a frozenset"""
+    return _get_role_info(user)["role_set"]
+
+
+def has_role(user, role):
+    """Check whether a user has a role"""
+    return role in get_role_set(user)
+
+
+def is_erpmax_manager(user=None):
+    """Check whether a user is an ERPMAX Manager"""
+    return _get_role_info(user)["is_erpmax_manager"]
+
+
+def has_erpmax_access(user=None):
+    """Check whether a user has any ERPMAX access role"""
+    return _get_role_info(user)["has_erpmax_access"]
+
+
+def on_user_change(doc, method=None):
+    """User event hook invalidating the user's cached roles
+
+    Has Role rows are saved with their User, so this also covers role
+    assignment changes.
+    """
+    bump_user_version(doc.name)
+    _get_request_memo().pop(doc.name, None)
+
+
+def _get_role_info(user=None):
+    user = user or frappe.session.user
+    memo = _get_request_memo()
+
+    if user in memo:
+        _record("request_hits")
+        return memo[user]
+
+    missed = []
+
+    def generator():
+        missed.append(True)
+        return frappe.get_roles(user)
+
+    roles = get_cached("roles", generator, user=user)
+    _record("misses" if missed else "cache_hits")
+
+    role_set = frozenset(roles)
+    memo[user] = {
+        "roles": list(roles),
+        "role_set": role_set,
+        "is_erpmax_manager": ERPMAX_MANAGER_ROLE in role_set,
+        "has_erpmax_access": any(role in role_set for role in ERPMAX_ACCESS_ROLES)
+    }
+    return memo[user]
+
+
+def _get_request_memo():
+    if not hasattr(frappe.local, "erpmax_role_memo"):
+        frappe.local.erpmax_role_memo = {}
+    return frappe.local.erpmax_role_memo
+
+
+def _record(kind):
+    """Count a lookup, pushing the counts to Redis every few lookups"""
+    with _stats_lock:
+        _stats[kind] += 1
+        _pending_stats[kind] += 1
+
+        if sum(_pending_stats.values()) < STATS_FLUSH_EVERY:
+            return
+
+        pending = dict(_pending_stats)
+        for key in _pending_stats:
+            _pending_stats[key] = 0
+
+    try:
+        pipe = frappe.cache().pipeline()
+        for key, value in pending.items():
+            if value:
+                pipe.hincrby(frappe.cache().make_key(STATS_KEY), key, value)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+@frappe.whitelist()
+def get_role_cache_stats():
+    """Get role lookup hit/miss counters for this process and the whole site"""
+    frappe.only_for("System Manager")
+
+    site = read_raw("hgetall", frappe.cache().make_key(STATS_KEY)) or {}
+    return {
+        "process": dict(_stats),
+        "site": {frappe.safe_decode(key): int(value) for key, value in site.items()}
+    }
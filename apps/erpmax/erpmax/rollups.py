@@ -0,0 +1,177 @@
+# ERPMAX Sales Rollups
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import add_days, add_months, flt, get_first_day, getdate, nowdate
+
+from erpmax.utils import get_affected_rows
+
+
+READY_KEY = "erpmax:rollups:ready"
+
+# A rebuild has to reach this far back before top-N reads switch to rollups
+READY_WINDOW_DAYS = 90
+
+
+def on_submit(doc, method=None):
+    """Document event hook adding a submitted Sales Invoice to the rollups"""
+    update_rollups(doc, 1)
+
+
+def on_cancel(doc, method=None):
+    """Document event hook removing a cancelled Sales Invoice from the rollups"""
+    update_rollups(doc, -1)
+
+
+def update_rollups(doc, sign):
+    """Add (`sign` = 1) or remove (`sign` = -1) an invoice from its daily rows
+
+    The rows are written in the invoice's own transaction, so they roll back
+    with it.
+    """
+    date = getdate(doc.posting_date)
+
+    frappe.db.sql("""
+        INSERT INTO `tabERPMAX Customer Daily Sales`
+            (`customer`, `date`, `customer_name`, `revenue`, `invoices`)
+        VALUES (%(customer)s, %(date)s, %(customer_name)s, %(revenue)s, %(invoices)s)
+        ON DUPLICATE KEY UPDATE
+            `customer_name` = VALUES(`customer_name`),
+            `revenue` = `revenue` + VALUES(`revenue`),
+            `invoices` = `invoices` + VALUES(`invoices`)
+    """, {
+        "customer": doc.customer,
+        "date": date,
+        "customer_name": doc.customer_name,
+        "revenue": flt(doc.grand_total) * sign,
+        "invoices": sign
+    })
+
+    items = {}
+    for row in doc.get("items") or []:
+        # Free-text lines have no item_code and no item to roll up
+        if not row.item_code:
+            continue
+        item = items.setdefault(row.item_code, [row.item_name, 0, 0])
+        item[1] += flt(row.qty) * sign
+        item[2] += flt(row.amount) * sign
+
+    if not items:
+        return
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabERPMAX Item Daily Sales`
+            (`item_code`, `date`, `item_name`, `qty`, `amount`)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(items))}
+        ON DUPLICATE KEY UPDATE
+            `item_name` = VALUES(`item_name`),
+            `qty` = `qty` + VALUES(`qty`),
+            `amount` = `amount` + VALUES(`amount`)
+    """, [
+        value
+        for item_code, (item_name, qty, amount) in items.items()
+        for value in (item_code, date, item_name, qty, amount)
+    ])
+
+
+def rollups_ready():
+    """Check whether a rebuild has backfilled the rollups"""
+    return bool(frappe.cache().get(frappe.cache().make_key(READY_KEY)))
+
+
+def get_top_customers(from_date, limit=5):
+    """Get the customers with the highest revenue since `from_date`"""
+    return frappe.db.sql("""
+        SELECT
+            customer,
+            MAX(customer_name) as customer_name,
+            SUM(revenue) as total_revenue,
+            SUM(invoices) as total_orders
+        FROM `tabERPMAX Customer Daily Sales`
+        WHERE date >= %s
+        GROUP BY customer
+        HAVING total_orders > 0
+        ORDER BY total_revenue DESC
+        LIMIT %s
+    """, [getdate(from_date), limit], as_dict=True)
+
+
+def get_top_items(from_date, limit=5):
+    """Get the items with the highest sales amount since `from_date`"""
+    return frappe.db.sql("""
+        SELECT
+            item_code,
+            MAX(item_name) as item_name,
+            SUM(qty) as total_qty,
+            SUM(amount) as total_amount
+        FROM `tabERPMAX Item Daily Sales`
+        WHERE date >= %s
+        GROUP BY item_code
+        HAVING total_qty != 0 OR total_amount != 0
+        ORDER BY total_amount DESC
+        LIMIT %s
+    """, [getdate(from_date), limit], as_dict=True)
+
+
+def rebuild_sales_rollups(from_date, to_date=None):
+    """Rebuild the customer and item daily rollups for a date range
+
+    Each month is deleted and re-aggregated with `INSERT ... SELECT` in its
+    own transaction. Rollup reads are switched on once the rebuilt range
+    covers the last `READY_WINDOW_DAYS` days. Returns the rows written.
+    """
+    from_date = getdate(from_date)
+    to_date = getdate(to_date or nowdate())
+    written = 0
+
+    window_start = from_date
+    while window_start <= to_date:
+        window_end = min(add_days(get_first_day(add_months(window_start, 1)), -1), to_date)
+        written += _rebuild_window(window_start, window_end)
+        frappe.db.commit()
+
+        window_start = add_days(window_end, 1)
+
+    if from_date <= getdate(add_days(nowdate(), -READY_WINDOW_DAYS)) and to_date >= getdate(nowdate()):
+        frappe.cache().set(frappe.cache().make_key(READY_KEY), 1)
+
+    return written
+
+
+def _rebuild_window(from_date, to_date):
+    values = {"from": from_date, "to": to_date}
+    written = 0
+
+    frappe.db.sql("""
+        DELETE FROM `tabERPMAX Customer Daily Sales`
+        WHERE date BETWEEN %(from)s AND %(to)s
+    """, values)
+    frappe.db.sql("""
+        INSERT INTO `tabERPMAX Customer Daily Sales`
+            (`customer`, `date`, `customer_name`, `revenue`, `invoices`)
+        SELECT customer, posting_date, MAX(customer_name), SUM(grand_total), COUNT(*)
+        FROM `tabSales Invoice`
+        WHERE docstatus = 1
+        AND posting_date BETWEEN %(from)s AND %(to)s
+        GROUP BY customer, posting_date
+    """, values)
+    written += get_affected_rows()
+
+    frappe.db.sql("""
+        DELETE FROM `tabERPMAX Item Daily Sales`
+        WHERE date BETWEEN %(from)s AND %(to)s
+    """, values)
+    frappe.db.sql("""
+        INSERT INTO `tabERPMAX Item Daily Sales`
+            (`item_code`, `date`, `item_name`, `qty`, `amount`)
+        SELECT sii.item_code, si.posting_date, MAX(sii.item_name), SUM(sii.qty), SUM(sii.amount)
+        FROM `tabSales Invoice Item` sii
+        JOIN `tabSales Invoice` si ON sii.parent = si.name
+        WHERE si.docstatus = 1
+        AND si.posting_date BETWEEN %(from)s AND %(to)s
+        AND COALESCE(sii.item_code, '') != ''
+        GROUP BY sii.item_code, si.posting_date
+    """, values)
+    written += get_affected_rows()
+
+    return written
@@ -0,0 +1,144 @@
+# ERPMAX Scheduler Task Registry
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import time
+import uuid
+
+import frappe
+from frappe.utils import now
+
+from erpmax import logs
+
+
+# Every scheduled helper is enqueued as its own job on its own queue, with a
+# timeout that also bounds its overlap lock.
+TASKS = {
+    "all": [
+        {"method": "erpmax.tasks.update_system_status", "queue": "short", "timeout": 60},
+        {"method": "erpmax.tasks.update_dashboard_cache", "queue": "short", "timeout": 300},
+        {"method": "erpmax.tasks.update_notification_bundles", "queue": "short", "timeout": 300}
+    ],
+    "hourly": [
+        {"method": "erpmax.tasks.check_system_health", "queue": "short", "timeout": 300},
+        {"method": "erpmax.tasks.update_statistics", "queue": "short", "timeout": 300},
+        {"method": "erpmax.tasks.reconcile_transaction_counters", "queue": "default", "timeout": 900},
+        {"method": "erpmax.tasks.reconcile_low_stock", "queue": "default", "timeout": 900}
+    ],
+    "daily": [
+        {"method": "erpmax.tasks.generate_daily_reports", "queue": "default", "timeout": 1500},
+        {"method": "erpmax.tasks.cleanup_old_logs", "queue": "long", "timeout": 3600},
+        {"method": "erpmax.tasks.cleanup_temp_files", "queue": "long", "timeout": 3600},
+        {"method": "erpmax.tasks.update_customer_scores", "queue": "long", "timeout": 3600},
+        {"method": "erpmax.tasks.trim_activity_feeds", "queue": "default", "timeout": 1500},
+        {"method": "erpmax.tasks.send_daily_summary", "queue": "default", "timeout": 600}
+    ],
+    "weekly": [
+        {"method": "erpmax.tasks.generate_weekly_reports", "queue": "default", "timeout": 1500},
+        {"method": "erpmax.tasks.database_maintenance", "queue": "long", "timeout": 3600},
+        {"method": "erpmax.tasks.update_item_popularity", "queue": "long", "timeout": 3600}
+    ],
+    "monthly": [
+        {"method": "erpmax.tasks.generate_monthly_reports", "queue": "default", "timeout": 1500},
+        {"method": "erpmax.tasks.archive_old_data", "queue": "long", "timeout": 7200},
+        {"method": "erpmax.tasks.system_optimization", "queue": "long", "timeout": 3600}
+    ]
+}
+
+STATUS_KEY = "erpmax:task_status"
+
+
+def get_task(method):
+    """Get the registry entry of a task"""
+    for tasks in TASKS.values():
+        for task in tasks:
+            if task["method"] == method:
+                return task
+
+    frappe.throw(f"Unknown ERPMAX task {method}")
+
+
+def enqueue_tasks(frequency):
+    """Enqueue every task of a frequency as an independent job"""
+    for task in TASKS[frequency]:
+        frappe.enqueue(
+            "erpmax.scheduler.run_task",
+            queue=task["queue"],
+            timeout=task["timeout"],
+            job_id=f"erpmax_task::{task['method']}",
+            deduplicate=True,
+            task_method=task["method"]
+        )
+
+
+def run_task(task_method):
+    """Run one task under its overlap lock and record the outcome
+
+    A run that finds the lock held (the previous run is still going) is
+    skipped. The lock expires with the task timeout, so a killed job never
+    blocks later runs for longer than that.
+    """
+    task = get_task(task_method)
+    lock_key = frappe.cache().make_key(f"erpmax:task_lock:{task_method}")
+    token = uuid.uuid4().hex
+
+    if not frappe.cache().set(lock_key, token, nx=True, ex=task["timeout"]):
+        record_run(task_method, "skipped", 0)
+        return
+
+    started = time.monotonic()
+    try:
+        frappe.get_attr(task_method)()
+        frappe.db.commit()
+        record_run(task_method, "success", time.monotonic() - started)
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(title=f"ERPMAX task {task_method} failed", message=frappe.get_traceback())
+        logs.error(f"ERPMAX task {task_method} failed: {str(e)}")
+        record_run(task_method, "failed", time.monotonic() - started, str(e))
+
+    finally:
+        if frappe.safe_decode(frappe.cache().get(lock_key) or b"") == token:
+            frappe.cache().delete(lock_key)
+
+
+def record_run(task_method, outcome, duration, error=None):
+    """Record the outcome and duration of a task run"""
+    key = frappe.cache().make_key(STATUS_KEY)
+    status = get_status(task_method)
+
+    status["runs"] = status.get("runs", 0) + 1
+    status["last_run"] = now()
+    status["last_outcome"] = outcome
+
+    if outcome != "skipped":
+        status["last_duration"] = round(duration, 3)
+        status["total_duration"] = round(status.get("total_duration", 0) + duration, 3)
+
+    if outcome == "success":
+        status["last_success"] = status["last_run"]
+    elif outcome == "failed":
+        status["failures"] = status.get("failures", 0) + 1
+        status["last_error"] = error
+    else:
+        status["skipped"] = status.get("skipped", 0) + 1
+
+    frappe.cache().hset(key, task_method, json.dumps(status))
+
+
+def get_status(task_method):
+    value = frappe.cache().hget(frappe.cache().make_key(STATUS_KEY), task_method)
+    return json.loads(value) if value else {}
+
+
+@frappe.whitelist()
+def get_task_status():
+    """Get outcome, duration and last success of every ERPMAX task"""
+    frappe.only_for("System Manager")
+
+    return {
+        task["method"]: dict(get_status(task["method"]), queue=task["queue"], frequency=frequency)
+        for frequency, tasks in TASKS.items()
+        for task in tasks
+    }
@@ -0,0 +1,83 @@
+# ERPMAX Database Schema
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+
+
+# Plain tables maintained by ERPMAX itself (feeds, counters, rollups). They
+# are not DocTypes, so they are created here on install and after migrate.
+TABLES = {
+    "ERPMAX Activity Feed": """
+        CREATE TABLE IF NOT EXISTS `tabERPMAX Activity Feed` (
+            `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+            `user` VARCHAR(140) NOT NULL,
+            `reference_doctype` VARCHAR(140) NOT NULL,
+            `reference_name` VARCHAR(140) NOT NULL,
+            `action` VARCHAR(20) NOT NULL,
+            `modified_by` VARCHAR(140),
+            `modified` DATETIME(6) NOT NULL,
+            PRIMARY KEY (`id`),
+            KEY `user_modified` (`user`, `modified`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "ERPMAX User Daily Stats": """
+        CREATE TABLE IF NOT EXISTS `tabERPMAX User Daily Stats` (
+            `user` VARCHAR(140) NOT NULL,
+            `date` DATE NOT NULL,
+            `documents_created` INT NOT NULL DEFAULT 0,
+            `logins` INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (`user`, `date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "ERPMAX Job Checkpoint": """
+        CREATE TABLE IF NOT EXISTS `tabERPMAX Job Checkpoint` (
+            `job` VARCHAR(140) NOT NULL,
+            `cursor` VARCHAR(140) NOT NULL,
+            `stats` TEXT,
+            `started` DATETIME(6) NOT NULL,
+            `modified` DATETIME(6) NOT NULL,
+            PRIMARY KEY (`job`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "ERPMAX Customer Daily Sales": """
+        CREATE TABLE IF NOT EXISTS `tabERPMAX Customer Daily Sales` (
+            `customer` VARCHAR(140) NOT NULL,
+            `date` DATE NOT NULL,
+            `customer_name` VARCHAR(140),
+            `revenue` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            `invoices` INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (`customer`, `date`),
+            KEY `date` (`date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "ERPMAX Item Daily Sales": """
+        CREATE TABLE IF NOT EXISTS `tabERPMAX Item Daily Sales` (
+            `item_code` VARCHAR(140) NOT NULL,
+            `date` DATE NOT NULL,
+            `item_name` VARCHAR(140),
+            `qty` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            `amount` DECIMAL(21, 9) NOT NULL DEFAULT 0,
+            PRIMARY KEY (`item_code`, `date`),
+            KEY `date` (`date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """
+}
+
+# Secondary indexes added after a table was first shipped, so existing
+# sites get them on migrate too
+INDEXES = {
+    "ERPMAX Activity Feed": {
+        "reference": "`reference_doctype`, `reference_name`"
+    }
+}
+
+
+def ensure_tables():
+    """Create missing ERPMAX tables and indexes"""
+    for table, ddl in TABLES.items():
+        frappe.db.sql_ddl(ddl)
+        frappe.logger().info(f"ERPMAX table {table} ensured")
+
+    for table, indexes in INDEXES.items():
+        for name, columns in indexes.items():
+            frappe.db.sql_ddl(f"ALTER TABLE `tab{table}` ADD INDEX IF NOT EXISTS `{name}` ({columns})")
@@ -0,0 +1,270 @@
+# ERPMAX Scoring Engines
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import add_days, nowdate, flt, getdate
+
+from erpmax import logs
+from erpmax.jobs import run_chunked
+from erpmax.utils import bulk_update_column
+
+
+CUSTOMER_SCORE_FIELD = "erpmax_customer_score"
+CUSTOMER_SCORE_WINDOW_DAYS = 30
+CUSTOMER_SCORE_CHUNK_SIZE = 5000
+
+# Site config `erpmax_customer_score_mode`: "formula" (default) or "rfm"
+RFM_WINDOW_DAYS = 365
+RFM_WEIGHTS = {"recency": 1, "frequency": 1, "monetary": 1}
+RFM_NO_ACTIVITY_SCORE = 1.0
+
+
+def default_customer_score(recent_orders, payment_count):
+    """Default customer score formula (recent orders and payments)"""
+    score = min(5, (recent_orders * 0.5) + (payment_count * 0.3) + 2.5)
+    return round(score, 1)
+
+
+def get_recent_order_counts(from_date, customers=None):
+    """Get submitted Sales Order counts per customer since `from_date`"""
+    conditions = ""
+    values = {"from_date": from_date}
+
+    if customers is not None:
+        if not customers:
+            return {}
+        conditions = "AND customer IN %(customers)s"
+        values["customers"] = tuple(customers)
+
+    return dict(frappe.db.sql(f"""
+        SELECT customer, COUNT(*)
+        FROM `tabSales Order`
+        WHERE docstatus = 1
+        AND transaction_date >= %(from_date)s
+        {conditions}
+        GROUP BY customer
+    """, values))
+
+
+def get_payment_counts(from_date, customers=None):
+    """Get submitted Payment Entry counts per customer since `from_date`"""
+    conditions = ""
+    values = {"from_date": from_date}
+
+    if customers is not None:
+        if not customers:
+            return {}
+        conditions = "AND party IN %(customers)s"
+        values["customers"] = tuple(customers)
+
+    return dict(frappe.db.sql(f"""
+        SELECT party, COUNT(*)
+        FROM `tabPayment Entry`
+        WHERE docstatus = 1
+        AND party_type = 'Customer'
+        AND posting_date >= %(from_date)s
+        {conditions}
+        GROUP BY party
+    """, values))
+
+
+def recompute_customer_scores(score_function=None, chunk_size=CUSTOMER_SCORE_CHUNK_SIZE):
+    """Recompute all customer scores with set-based queries
+
+    Order and payment counts are aggregated for every customer with one
+    grouped query each. Customers are then walked by the resumable chunk
+    runner and only scores that actually changed are written back, one
+    batched UPDATE per chunk committed together with the checkpoint, so no
+    lock is held for long and a killed run resumes where it stopped.
+    """
+    if not frappe.db.has_column("Customer", CUSTOMER_SCORE_FIELD):
+        return {"customers": 0, "updated": 0}
+
+    if score_function is None and frappe.conf.get("erpmax_customer_score_mode") == "rfm":
+        try:
+            return recompute_rfm_scores()
+        except ImportError:
+            logs.warning("ERPMAX: pandas is not installed, using the default customer score")
+
+    score_function = score_function or default_customer_score
+
+    from_date = add_days(nowdate(), -CUSTOMER_SCORE_WINDOW_DAYS)
+    order_counts = get_recent_order_counts(from_date)
+    payment_counts = get_payment_counts(from_date)
+
+    def process_chunk(customers):
+        changed = {}
+        for customer in customers:
+            score = score_function(
+                order_counts.get(customer.name, 0), payment_counts.get(customer.name, 0)
+            )
+            current_score = customer[CUSTOMER_SCORE_FIELD]
+            if current_score is None or round(flt(current_score), 1) != score:
+                changed[customer.name] = score
+
+        return {"updated": bulk_update_column("Customer", CUSTOMER_SCORE_FIELD, changed)}
+
+    stats = run_chunked(
+        "erpmax_customer_scores", "Customer", process_chunk,
+        fields=("name", CUSTOMER_SCORE_FIELD), chunk_size=chunk_size
+    )
+    stats["customers"] = stats["rows"]
+    stats.setdefault("updated", 0)
+    return stats
+
+
+def get_rfm_aggregates(from_date):
+    """Get last invoice date, invoice count and invoiced amount per customer
+
+    Returns `(customers, last_dates, frequencies, amounts)` column lists from
+    one grouped query over submitted, non-return Sales Invoices.
+    """
+    rows = frappe.db.sql("""
+        SELECT customer, MAX(posting_date), COUNT(*), SUM(base_grand_total)
+        FROM `tabSales Invoice`
+        WHERE docstatus = 1
+        AND is_return = 0
+        AND posting_date >= %(from_date)s
+        GROUP BY customer
+    """, {"from_date": from_date})
+
+    return tuple(list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+
+
+def compute_rfm_scores(aggregates, today=None, weights=None):
+    """Compute percentile RFM scores for all buying customers at once
+
+    Recency, frequency and monetary value are each ranked as a percentile
+    among the customers who bought in the window, then combined by `weights`
+    into a 1 to 5 score. Returns `{customer: score}`; customers without
+    invoices in the window score `RFM_NO_ACTIVITY_SCORE`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    weights = weights or RFM_WEIGHTS
+    names, last_dates, frequencies, amounts = aggregates
+    if not names:
+        return {}
+
+    activity = pd.DataFrame({
+        "last_date": pd.to_datetime(pd.Series(last_dates, dtype="object")).to_numpy(),
+        "frequency": np.asarray(frequencies, dtype=float),
+        "monetary": np.asarray([flt(amount) for amount in amounts], dtype=float)
+    }, index=pd.Index(names))
+    activity["recency"] = (pd.Timestamp(getdate(today or nowdate())) - activity["last_date"]).dt.days
+
+    ranks = pd.DataFrame({
+        "recency": activity["recency"].rank(pct=True, ascending=False),
+        "frequency": activity["frequency"].rank(pct=True),
+        "monetary": activity["monetary"].rank(pct=True)
+    })
+    total_weight = sum(weights.values())
+    combined = sum(ranks[column] * weight for column, weight in weights.items()) / total_weight
+
+    return (1 + 4 * combined).round(1).astype(float).to_dict()
+
+
+def recompute_rfm_scores(chunk_size=CUSTOMER_SCORE_CHUNK_SIZE):
+    """Recompute all customer scores as percentile RFM scores
+
+    Aggregates come from one grouped query and are scored in a few
+    vectorized column operations instead of a Python loop. Customers are
+    then walked by the resumable chunk runner and only changed scores are
+    bulk-written, one committed batch per chunk, so no lock is held for long.
+    Raises ImportError when pandas is not installed.
+    """
+    scores = compute_rfm_scores(get_rfm_aggregates(add_days(nowdate(), -RFM_WINDOW_DAYS)))
+
+    def process_chunk(customers):
+        changed = {}
+        for customer in customers:
+            score = scores.get(customer.name, RFM_NO_ACTIVITY_SCORE)
+            current_score = customer[CUSTOMER_SCORE_FIELD]
+            if current_score is None or round(flt(current_score), 1) != score:
+                changed[customer.name] = score
+
+        return {"updated": bulk_update_column("Customer", CUSTOMER_SCORE_FIELD, changed)}
+
+    stats = run_chunked(
+        "erpmax_customer_rfm_scores", "Customer", process_chunk,
+        fields=("name", CUSTOMER_SCORE_FIELD), chunk_size=chunk_size
+    )
+    stats["customers"] = stats["rows"]
+    stats.setdefault("updated", 0)
+    return stats
+
+
+ITEM_POPULARITY_FIELD = "erpmax_popularity_score"
+ITEM_POPULARITY_WINDOW_DAYS = 90
+ITEM_POPULARITY_CHUNK_SIZE = 5000
+
+
+def default_item_popularity(sales_qty):
+    """Default item popularity formula (quantity sold in the window)"""
+    return min(100, flt(sales_qty) * 2)
+
+
+def get_item_sales_quantities(from_date, items=None):
+    """Get submitted Sales Order quantities per item since `from_date`
+
+    Returns `({item_code: qty}, order_lines_scanned)` from one grouped scan.
+    """
+    conditions = ""
+    values = {"from_date": from_date}
+
+    if items is not None:
+        if not items:
+            return {}, 0
+        conditions = "AND soi.item_code IN %(items)s"
+        values["items"] = tuple(items)
+
+    rows = frappe.db.sql(f"""
+        SELECT soi.item_code, SUM(soi.qty), COUNT(*)
+        FROM `tabSales Order Item` soi
+        JOIN `tabSales Order` so ON soi.parent = so.name
+        WHERE so.transaction_date >= %(from_date)s
+        AND so.docstatus = 1
+        {conditions}
+        GROUP BY soi.item_code
+    """, values)
+
+    quantities = {item_code: flt(qty) for item_code, qty, _lines in rows}
+    return quantities, sum(lines for _item_code, _qty, lines in rows)
+
+
+def recompute_item_popularity(score_function=None, chunk_size=ITEM_POPULARITY_CHUNK_SIZE):
+    """Recompute all item popularity scores with one grouped scan
+
+    90-day quantities for every item come from a single grouped query over
+    the order lines. Items are then streamed by the resumable chunk runner
+    and only changed scores are written back. Returns rows scanned and
+    updated so the weekly run can be checked against its maintenance window.
+    """
+    score_function = score_function or default_item_popularity
+
+    if not frappe.db.has_column("Item", ITEM_POPULARITY_FIELD):
+        return {"order_lines_scanned": 0, "items_scanned": 0, "updated": 0}
+
+    from_date = add_days(nowdate(), -ITEM_POPULARITY_WINDOW_DAYS)
+    quantities, order_lines_scanned = get_item_sales_quantities(from_date)
+
+    def process_chunk(items):
+        changed = {}
+        for item in items:
+            score = score_function(quantities.get(item.name, 0))
+            current_score = item[ITEM_POPULARITY_FIELD]
+            if current_score is None or flt(current_score) != score:
+                changed[item.name] = score
+
+        return {"updated": bulk_update_column("Item", ITEM_POPULARITY_FIELD, changed)}
+
+    stats = run_chunked(
+        "erpmax_item_popularity", "Item", process_chunk,
+        fields=("name", ITEM_POPULARITY_FIELD), chunk_size=chunk_size,
+        resume_within=3 * 7 * 24 * 3600
+    )
+    stats["order_lines_scanned"] = order_lines_scanned
+    stats["items_scanned"] = stats["rows"]
+    stats.setdefault("updated", 0)
+    return stats
@@ -0,0 +1,142 @@
+# ERPMAX Dashboard Snapshots
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import time
+import uuid
+
+import frappe
+from frappe.utils import cint, now
+
+
+SNAPSHOT_KEY = "erpmax_dashboard_data"
+SNAPSHOT_LOCK_KEY = "erpmax_dashboard_data_lock"
+SNAPSHOT_LOCK_TIMEOUT = 120
+
+# Seconds between background refreshes (site config: erpmax_snapshot_interval)
+DEFAULT_SNAPSHOT_INTERVAL = 300
+
+# Oldest snapshot readers accept (site config: erpmax_snapshot_max_age)
+DEFAULT_SNAPSHOT_MAX_AGE = 900
+
+# Global, user-independent dashboard sections served from the snapshot
+SNAPSHOT_SECTIONS = {
+    "counts": "erpmax.queries.get_global_counts",
+    "sales": "erpmax.queries.get_sales_data",
+    "purchase": "erpmax.queries.get_purchase_data",
+    "quick_stats": "erpmax.queries.build_quick_stats"
+}
+
+
+def get_snapshot_interval():
+    """Get the background refresh interval in seconds"""
+    return cint(frappe.conf.get("erpmax_snapshot_interval")) or DEFAULT_SNAPSHOT_INTERVAL
+
+
+def get_snapshot_max_age():
+    """Get the staleness bound in seconds"""
+    return cint(frappe.conf.get("erpmax_snapshot_max_age")) or DEFAULT_SNAPSHOT_MAX_AGE
+
+
+def get_snapshot():
+    """Get the dashboard snapshot, rebuilding it if older than the staleness bound
+
+    When another process is already rebuilding, a stale snapshot is served
+    instead of piling more aggregation queries onto the database.
+    """
+    snapshot = frappe.cache().get_value(SNAPSHOT_KEY)
+
+    if snapshot and get_snapshot_age(snapshot) <= get_snapshot_max_age():
+        return snapshot
+
+    token = acquire_snapshot_lock()
+    if not token and snapshot:
+        return snapshot
+
+    try:
+        return build_snapshot()
+    finally:
+        if token:
+            release_snapshot_lock(token)
+
+
+def peek_snapshot():
+    """Get the stored snapshot without rebuilding it
+
+    Returns `(snapshot, is_fresh)`; snapshot is None when none is stored.
+    """
+    snapshot = frappe.cache().get_value(SNAPSHOT_KEY)
+    return snapshot, bool(snapshot) and get_snapshot_age(snapshot) <= get_snapshot_max_age()
+
+
+def enqueue_snapshot_refresh():
+    """Rebuild the snapshot in a background job"""
+    frappe.enqueue(
+        "erpmax.snapshots.refresh_snapshot",
+        queue="short",
+        job_id="erpmax_dashboard_snapshot",
+        deduplicate=True,
+        force=True
+    )
+
+
+def get_snapshot_section(section):
+    """Get one section of the dashboard snapshot"""
+    return get_snapshot()[section]
+
+
+def get_snapshot_age(snapshot):
+    """Get the age of a snapshot in seconds"""
+    return time.time() - snapshot.get("built_at", 0)
+
+
+def build_snapshot():
+    """Compute every global dashboard section and store the snapshot"""
+    started = time.time()
+
+    snapshot = {
+        section: frappe.get_attr(method)()
+        for section, method in SNAPSHOT_SECTIONS.items()
+    }
+    snapshot["timestamp"] = now()
+    snapshot["built_at"] = started
+    snapshot["build_time"] = round(time.time() - started, 3)
+
+    frappe.cache().set_value(
+        SNAPSHOT_KEY, snapshot, expires_in_sec=get_snapshot_max_age() * 4
+    )
+    return snapshot
+
+
+def refresh_snapshot(force=False):
+    """Background producer rebuilding the snapshot once per interval"""
+    snapshot = frappe.cache().get_value(SNAPSHOT_KEY)
+
+    if not force and snapshot and get_snapshot_age(snapshot) < get_snapshot_interval():
+        return snapshot
+
+    token = acquire_snapshot_lock()
+    if not token:
+        return snapshot
+
+    try:
+        return build_snapshot()
+    finally:
+        release_snapshot_lock(token)
+
+
+def acquire_snapshot_lock():
+    """Acquire the rebuild lock, returns its token or None if another process holds it"""
+    token = uuid.uuid4().hex
+
+    if frappe.cache().set(
+        frappe.cache().make_key(SNAPSHOT_LOCK_KEY), token, nx=True, ex=SNAPSHOT_LOCK_TIMEOUT
+    ):
+        return token
+
+
+def release_snapshot_lock(token):
+    """Release the rebuild lock, unless it expired and another process took it since"""
+    lock_key = frappe.cache().make_key(SNAPSHOT_LOCK_KEY)
+
+    if frappe.safe_decode(frappe.cache().get(lock_key) or b"") == token:
+        frappe.cache().delete(lock_key)
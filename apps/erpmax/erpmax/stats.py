@@ -0,0 +1,128 @@
+# ERPMAX Statistics Queries
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cint, flt, get_first_day, getdate, nowdate
+
+
+def get_transaction_stats(date=None):
+    """Get today, month and overdue figures of every transaction table
+
+    One statement (a UNION ALL of conditional aggregations, one branch per
+    table) replaces the separate COUNT/SUM round trips. The result is
+    memoized for the request, so every dashboard section built from it
+    shares the single round trip. Returns `{doctype: {today, month,
+    month_total, open}}` where `open` is the overdue invoice count for Sales
+    Invoice and the pending count for Quotation.
+    """
+    today = getdate(date or nowdate())
+    memo = _get_request_memo()
+
+    if today not in memo:
+        memo[today] = _query_transaction_stats(today)
+
+    return memo[today]
+
+
+def _query_transaction_stats(today):
+    rows = frappe.db.sql("""
+        SELECT
+            'Sales Order',
+            SUM(CASE WHEN transaction_date = %(today)s THEN 1 ELSE 0 END),
+            COUNT(*),
+            SUM(grand_total),
+            0
+        FROM `tabSales Order`
+        WHERE docstatus = 1
+        AND transaction_date >= %(month_start)s
+
+        UNION ALL
+
+        SELECT
+            'Sales Invoice',
+            SUM(CASE WHEN posting_date = %(today)s THEN 1 ELSE 0 END),
+            SUM(CASE WHEN posting_date >= %(month_start)s THEN 1 ELSE 0 END),
+            SUM(CASE WHEN posting_date >= %(month_start)s THEN grand_total ELSE 0 END),
+            SUM(CASE WHEN due_date < %(today)s AND outstanding_amount >= 0.01 THEN 1 ELSE 0 END)
+        FROM `tabSales Invoice`
+        WHERE docstatus = 1
+        AND (
+            posting_date >= %(month_start)s
+            OR (due_date < %(today)s AND outstanding_amount >= 0.01)
+        )
+
+        UNION ALL
+
+        SELECT
+            'Purchase Order',
+            SUM(CASE WHEN transaction_date = %(today)s THEN 1 ELSE 0 END),
+            COUNT(*),
+            SUM(grand_total),
+            0
+        FROM `tabPurchase Order`
+        WHERE docstatus = 1
+        AND transaction_date >= %(month_start)s
+
+        UNION ALL
+
+        SELECT
+            'Purchase Invoice',
+            SUM(CASE WHEN posting_date = %(today)s THEN 1 ELSE 0 END),
+            COUNT(*),
+            SUM(grand_total),
+            0
+        FROM `tabPurchase Invoice`
+        WHERE docstatus = 1
+        AND posting_date >= %(month_start)s
+
+        UNION ALL
+
+        SELECT 'Quotation', 0, 0, 0, COUNT(*)
+        FROM `tabQuotation`
+        WHERE docstatus = 1
+        AND status = 'Open'
+    """, {"today": today, "month_start": get_first_day(today)})
+
+    return {
+        doctype: {
+            "today": cint(today_count),
+            "month": cint(month_count),
+            "month_total": flt(month_total),
+            "open": cint(open_count)
+        }
+        for doctype, today_count, month_count, month_total, open_count in rows
+    }
+
+
+def get_sales_stats(date=None):
+    """Get sales statistics in the `get_sales_data` shape"""
+    stats = get_transaction_stats(date)
+
+    return {
+        "sales_orders_today": stats["Sales Order"]["today"],
+        "sales_orders_month": stats["Sales Order"]["month"],
+        "sales_invoices_today": stats["Sales Invoice"]["today"],
+        "sales_invoices_month": stats["Sales Invoice"]["month"]
+    }
+
+
+def get_purchase_stats(date=None):
+    """Get purchase statistics in the `get_purchase_data` shape"""
+    stats = get_transaction_stats(date)
+
+    return {
+        "purchase_orders_today": stats["Purchase Order"]["today"],
+        "purchase_orders_month": stats["Purchase Order"]["month"],
+        "purchase_invoices_today": stats["Purchase Invoice"]["today"],
+        "purchase_invoices_month": stats["Purchase Invoice"]["month"]
+    }
+
+
+def clear_request_memo():
+    frappe.local.erpmax_transaction_stats = {}
+
+
+def _get_request_memo():
+    if not hasattr(frappe.local, "erpmax_transaction_stats"):
+        frappe.local.erpmax_transaction_stats = {}
+    return frappe.local.erpmax_transaction_stats
@@ -0,0 +1,177 @@
+# ERPMAX Low Stock Index
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cint, cstr
+
+from erpmax.utils import read_raw
+
+
+# Redis set of the names of Bins at or below their reorder level (of enabled
+# stock items), kept in step by stock events and rebuilt by reconciliation
+INDEX_KEY = "erpmax:low_stock"
+READY_KEY = "erpmax:low_stock:ready"
+
+LOW_STOCK_CONDITION = """
+    b.actual_qty <= COALESCE(b.reorder_level, 0)
+    AND i.disabled = 0
+    AND i.is_stock_item = 1
+"""
+
+DEFAULT_LOW_STOCK_BINS = 20
+MAX_LOW_STOCK_BINS = 100
+
+
+def on_stock_ledger_entry(doc, method=None):
+    """Document event hook rechecking the Bin a Stock Ledger Entry moved
+
+    ERPNext updates Bin quantities without Bin document events, so stock
+    movements are picked up from their ledger entries instead.
+    """
+    queue_check(item_code=doc.item_code, warehouse=doc.warehouse)
+
+
+def on_bin_change(doc, method=None):
+    """Document event hook rechecking a saved Bin"""
+    queue_check(item_code=doc.item_code, warehouse=doc.warehouse)
+
+
+def on_item_change(doc, method=None):
+    """Document event hook rechecking every Bin of a changed Item"""
+    queue_check(item_code=doc.name)
+
+
+def queue_check(item_code, warehouse=None):
+    """Recheck Bins once the current transaction commits
+
+    Checks are collected per transaction, so a voucher posting many ledger
+    entries costs one pass, and a rolled back transaction costs none.
+    """
+    pending = getattr(frappe.local, "erpmax_low_stock_pending", None)
+
+    if pending is None:
+        pending = frappe.local.erpmax_low_stock_pending = set()
+        frappe.db.after_commit.add(_run_pending_checks)
+        frappe.db.after_rollback.add(_clear_pending_checks)
+
+    pending.add((item_code, warehouse))
+
+
+def _run_pending_checks():
+    pending = _clear_pending_checks()
+
+    items = {item_code for item_code, warehouse in pending if warehouse is None}
+    bins = [(item_code, warehouse) for item_code, warehouse in pending if item_code not in items]
+
+    for item_code in items:
+        update_index("b.item_code = %s", [item_code])
+
+    for start in range(0, len(bins), 500):
+        batch = bins[start:start + 500]
+        update_index(
+            " OR ".join(["(b.item_code = %s AND b.warehouse = %s)"] * len(batch)),
+            [value for pair in batch for value in pair]
+        )
+
+
+def _clear_pending_checks():
+    pending = getattr(frappe.local, "erpmax_low_stock_pending", None) or set()
+    frappe.local.erpmax_low_stock_pending = None
+    return pending
+
+
+def update_index(conditions, values):
+    """Add or remove the Bins matching `conditions` from the index"""
+    rows = frappe.db.sql(f"""
+        SELECT b.name, CASE WHEN {LOW_STOCK_CONDITION} THEN 1 ELSE 0 END
+        FROM `tabBin` b
+        JOIN `tabItem` i ON b.item_code = i.item_code
+        WHERE {conditions}
+    """, values)
+
+    low = [name for name, is_low in rows if is_low]
+    ok = [name for name, is_low in rows if not is_low]
+
+    key = frappe.cache().make_key(INDEX_KEY)
+    pipe = frappe.cache().pipeline()
+    if low:
+        pipe.sadd(key, *low)
+    if ok:
+        pipe.srem(key, *ok)
+    pipe.execute()
+
+
+def index_ready():
+    """Check whether the index has been built by a reconciliation run"""
+    return bool(frappe.cache().get(frappe.cache().make_key(READY_KEY)))
+
+
+def get_low_stock_count():
+    """Get the number of Bins at or below their reorder level"""
+    return read_raw("scard", frappe.cache().make_key(INDEX_KEY))
+
+
+@frappe.whitelist()
+def get_low_stock_bins(limit=DEFAULT_LOW_STOCK_BINS):
+    """Get item, warehouse and quantities of up to `limit` low stock Bins
+
+    Read from the index once it is built, from SQL until then.
+    """
+    frappe.has_permission("Bin", "read", throw=True)
+    limit = min(cint(limit) or DEFAULT_LOW_STOCK_BINS, MAX_LOW_STOCK_BINS)
+
+    if not index_ready():
+        return frappe.db.sql(f"""
+            SELECT b.item_code, b.warehouse, b.actual_qty, b.reorder_level
+            FROM `tabBin` b
+            JOIN `tabItem` i ON b.item_code = i.item_code
+            WHERE {LOW_STOCK_CONDITION}
+            ORDER BY b.item_code, b.warehouse
+            LIMIT %(limit)s
+        """, {"limit": limit}, as_dict=True)
+
+    names = [
+        cstr(name)
+        for name in read_raw("srandmember", frappe.cache().make_key(INDEX_KEY), limit) or []
+    ]
+    if not names:
+        return []
+
+    return frappe.db.sql("""
+        SELECT item_code, warehouse, actual_qty, reorder_level
+        FROM `tabBin`
+        WHERE name IN %(names)s
+        ORDER BY item_code, warehouse
+    """, {"names": tuple(names)}, as_dict=True)
+
+
+def reconcile_low_stock_index():
+    """Rebuild the index from SQL and report drift
+
+    The new set is built under a temporary key and renamed over the index,
+    so readers never see it half built. Returns `(missing, stale)`: Bins
+    the index lacked and Bins it held that are no longer low.
+    """
+    actual = set(frappe.db.sql_list(f"""
+        SELECT b.name
+        FROM `tabBin` b
+        JOIN `tabItem` i ON b.item_code = i.item_code
+        WHERE {LOW_STOCK_CONDITION}
+    """))
+
+    cache = frappe.cache()
+    key = cache.make_key(INDEX_KEY)
+    current = {cstr(name) for name in read_raw("smembers", key) or []}
+
+    pipe = cache.pipeline()
+    if actual:
+        temp_key = cache.make_key(f"{INDEX_KEY}:rebuild")
+        pipe.delete(temp_key)
+        pipe.sadd(temp_key, *actual)
+        pipe.rename(temp_key, key)
+    else:
+        pipe.delete(key)
+    pipe.set(cache.make_key(READY_KEY), 1)
+    pipe.execute()
+
+    return sorted(actual - current), sorted(current - actual)
@@ -1,89 +1,55 @@
 # ERPMAX Background Tasks
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
-import frappe
-from frappe import _
-from frappe.utils import now, add_days, get_datetime
+import time
+
+from frappe.utils import add_days
+
+from erpmax import logs
+from erpmax.activity import trim_activity_feed
+from erpmax.archive import run_archival
+from erpmax.counters import reconcile_counters
+from erpmax.notifications import refresh_notification_bundles
+from erpmax.purge import purge_files, purge_logs
+from erpmax.scheduler import enqueue_tasks
+from erpmax.scoring import (
+    CUSTOMER_SCORE_WINDOW_DAYS,
+    ITEM_POPULARITY_WINDOW_DAYS,
+    default_customer_score,
+    default_item_popularity,
+    get_item_sales_quantities,
+    get_payment_counts,
+    get_recent_order_counts,
+    recompute_customer_scores,
+    recompute_item_popularity,
+)
+from erpmax.snapshots import refresh_snapshot
+from erpmax.stock_index import reconcile_low_stock_index
 
 
 def all():
     """Tasks that run every few minutes"""
-    try:
-        # Update system status
-        update_system_status()
-        
-        # Clean temporary files
-        cleanup_temp_files()
-        
-    except Exception as e:
-        frappe.logger().error(f"Error in ERPMAX all tasks: {str(e)}")
+    enqueue_tasks("all")
 
 
 def hourly():
     """Tasks that run every hour"""
-    try:
-        # Update dashboard cache
-        update_dashboard_cache()
-        
-        # Check system health
-        check_system_health()
-        
-        # Update statistics
-        update_statistics()
-        
-    except Exception as e:
-        frappe.logger().error(f"Error in ERPMAX hourly tasks: {str(e)}")
+    enqueue_tasks("hourly")
 
 
 def daily():
     """Tasks that run daily"""
-    try:
-        # Generate daily reports
-        generate_daily_reports()
-        
-        # Cleanup old logs
-        cleanup_old_logs()
-        
-        # Update customer scores
-        update_customer_scores()
-        
-        # Send daily summary
-        send_daily_summary()
-        
-    except Exception as e:
-        frappe.logger().error(f"Error in ERPMAX daily tasks: {str(e)}")
+    enqueue_tasks("daily")
 
 
 def weekly():
     """Tasks that run weekly"""
-    try:
-        # Generate weekly reports
-        generate_weekly_reports()
-        
-        # Database maintenance
-        database_maintenance()
-        
-        # Update item popularity scores
-        update_item_popularity()
-        
-    except Exception as e:
-        frappe.logger().error(f"Error in ERPMAX weekly tasks: {str(e)}")
+    enqueue_tasks("weekly")
 
 
 def monthly():
     """Tasks that run monthly"""
-    try:
-        # Generate monthly reports
-        generate_monthly_reports()
-        
-        # Archive old data
-        archive_old_data()
-        
-        # System optimization
-        system_optimization()
-        
-    except Exception as e:
-        frappe.logger().error(f"Error in ERPMAX monthly tasks: {str(e)}")
+    enqueue_tasks("monthly")
 
 
 # Helper functions
@@ -91,38 +57,38 @@ def monthly():
 def update_system_status():
     """Update system status information"""
     # Log system status
-    frappe.logger().info("ERPMAX system status updated")
+    logs.info("ERPMAX system status updated")
 
 
 def cleanup_temp_files():
     """Clean up temporary files"""
-    # Clean up logic here
-    pass
+    report = purge_files(dry_run=False)
+    logs.info(
+        "Temporary files cleaned up: "
+        + ", ".join(f"{path} {r['files']} files, {r['bytes']} bytes" for path, r in report.items())
+    )
 
 
 def update_dashboard_cache():
     """Update dashboard cache data"""
-    try:
-        # Cache dashboard data for better performance
-        dashboard_data = {
-            "customers": frappe.db.count("Customer"),
-            "suppliers": frappe.db.count("Supplier"),
-            "items": frappe.db.count("Item"),
-            "sales_orders": frappe.db.count("Sales Order", {"docstatus": 1}),
-            "timestamp": now()
-        }
-        
-        frappe.cache().set_value("erpmax_dashboard_data", dashboard_data)
-        frappe.logger().info("Dashboard cache updated")
-        
-    except Exception as e:
-        frappe.logger().error(f"Error updating dashboard cache: {str(e)}")
+    # Rebuild the dashboard snapshot once per configured interval
+    snapshot = refresh_snapshot()
+    
+    if snapshot:
+        logs.info(f"Dashboard snapshot is from {snapshot['timestamp']}")
+
+
+def update_notification_bundles():
+    """Rebuild invalidated notification bundles of active users"""
+    refreshed = refresh_notification_bundles()
+    if refreshed:
+        logs.info(f"Refreshed notification bundles for {refreshed} users")
 
 
 def check_system_health():
     """Check system health metrics"""
     # System health check logic
-    frappe.logger().info("System health check completed")
+    logs.info("System health check completed")
 
 
 def update_statistics():
@@ -131,70 +97,72 @@ def update_statistics():
     pass
 
 
+def reconcile_transaction_counters():
+    """Rebuild transaction counters from the database and report drift"""
+    drift = reconcile_counters()
+    
+    if drift:
+        logs.warning(f"ERPMAX counters drifted on {len(drift)} values: {drift[:20]}")
+    else:
+        logs.info("ERPMAX counters reconciled without drift")
+
+
+def reconcile_low_stock():
+    """Rebuild the low stock index from the database and report drift"""
+    missing, stale = reconcile_low_stock_index()
+    
+    if missing or stale:
+        logs.warning(
+            f"ERPMAX low stock index drifted: {len(missing)} missing, {len(stale)} stale"
+        )
+
+
 def generate_daily_reports():
     """Generate daily reports"""
     # Daily report generation logic
-    frappe.logger().info("Daily reports generated")
+    logs.info("Daily reports generated")
 
 
 def cleanup_old_logs():
     """Clean up old log files"""
-    # Log cleanup logic
-    pass
+    report = purge_logs()
+    logs.info(
+        "Old logs cleaned up: "
+        + ", ".join(f"{table} {r['rows']} rows, ~{r['bytes']} bytes" for table, r in report.items())
+    )
 
 
 def update_customer_scores():
     """Update customer scores based on activity"""
-    try:
-        # Update customer scores based on recent activity
-        customers = frappe.get_all("Customer", fields=["name"])
-        
-        for customer in customers:
-            # Calculate score based on recent orders, payments, etc.
-            score = calculate_customer_score(customer.name)
-            
-            # Update customer score if custom field exists
-            if frappe.db.has_column("Customer", "erpmax_customer_score"):
-                frappe.db.set_value("Customer", customer.name, "erpmax_customer_score", score)
-        
-        frappe.db.commit()
-        frappe.logger().info(f"Updated scores for {len(customers)} customers")
-        
-    except Exception as e:
-        frappe.logger().error(f"Error updating customer scores: {str(e)}")
+    stats = recompute_customer_scores()
+    logs.info(
+        f"Updated scores for {stats['updated']} of {stats['customers']} customers"
+    )
 
 
 def calculate_customer_score(customer_name):
     """Calculate customer score based on various factors"""
     try:
+        from_date = add_days(None, -CUSTOMER_SCORE_WINDOW_DAYS)
+        
         # Get recent orders count
-        recent_orders = frappe.db.count(
-            "Sales Order",
-            {
-                "customer": customer_name,
-                "transaction_date": [">=", add_days(None, -30)],
-                "docstatus": 1
-            }
-        )
+        recent_orders = get_recent_order_counts(from_date, [customer_name]).get(customer_name, 0)
         
         # Get payment history
-        payment_count = frappe.db.count(
-            "Payment Entry",
-            {
-                "party": customer_name,
-                "posting_date": [">=", add_days(None, -30)],
-                "docstatus": 1
-            }
-        )
+        payment_count = get_payment_counts(from_date, [customer_name]).get(customer_name, 0)
         
-        # Calculate score (simple algorithm)
-        score = min(5, (recent_orders * 0.5) + (payment_count * 0.3) + 2.5)
-        return round(score, 1)
+        return default_customer_score(recent_orders, payment_count)
         
     except Exception:
         return 3.0  # Default score
 
 
+def trim_activity_feeds():
+    """Trim per-user activity feeds to their configured size"""
+    trimmed = trim_activity_feed()
+    logs.info(f"Trimmed {trimmed} activity feed entries")
+
+
 def send_daily_summary():
     """Send daily summary to administrators"""
     # Daily summary email logic
@@ -203,49 +171,36 @@ def send_daily_summary():
 
 def generate_weekly_reports():
     """Generate weekly reports"""
-    frappe.logger().info("Weekly reports generated")
+    logs.info("Weekly reports generated")
 
 
 def database_maintenance():
     """Perform database maintenance tasks"""
-    frappe.logger().info("Database maintenance completed")
+    logs.info("Database maintenance completed")
 
 
 def update_item_popularity():
     """Update item popularity scores"""
-    try:
-        items = frappe.get_all("Item", fields=["name"])
-        
-        for item in items:
-            # Calculate popularity based on sales
-            popularity = calculate_item_popularity(item.name)
-            
-            # Update if custom field exists
-            if frappe.db.has_column("Item", "erpmax_popularity_score"):
-                frappe.db.set_value("Item", item.name, "erpmax_popularity_score", popularity)
-        
-        frappe.db.commit()
-        frappe.logger().info(f"Updated popularity for {len(items)} items")
-        
-    except Exception as e:
-        frappe.logger().error(f"Error updating item popularity: {str(e)}")
+    start = time.monotonic()
+    stats = recompute_item_popularity()
+    
+    logs.info(
+        f"Updated popularity for {stats['updated']} items "
+        f"({stats['items_scanned']} items and {stats['order_lines_scanned']} "
+        f"order lines scanned in {time.monotonic() - start:.1f}s)"
+    )
 
 
 def calculate_item_popularity(item_code):
     """Calculate item popularity score"""
     try:
         # Get sales count in last 3 months
-        sales_count = frappe.db.sql("""
-            SELECT SUM(qty) 
-            FROM `tabSales Order Item` soi
-            JOIN `tabSales Order` so ON soi.parent = so.name
-            WHERE soi.item_code = %s 
-            AND so.transaction_date >= %s
-            AND so.docstatus = 1
-        """, [item_code, add_days(None, -90)])[0][0] or 0
+        quantities, _lines = get_item_sales_quantities(
+            add_days(None, -ITEM_POPULARITY_WINDOW_DAYS), [item_code]
+        )
         
         # Simple popularity score
-        return min(100, sales_count * 2)
+        return default_item_popularity(quantities.get(item_code, 0))
         
     except Exception:
         return 0
@@ -253,14 +208,18 @@ def calculate_item_popularity(item_code):
 
 def generate_monthly_reports():
     """Generate monthly reports"""
-    frappe.logger().info("Monthly reports generated")
+    logs.info("Monthly reports generated")
 
 
 def archive_old_data():
     """Archive old data for performance"""
-    frappe.logger().info("Old data archival completed")
+    archived = run_archival()
+    logs.info(
+        "Old data archival completed: "
+        + ", ".join(f"{doctype} {count}" for doctype, count in archived.items())
+    )
 
 
 def system_optimization():
     """Perform system optimization tasks"""
-    frappe.logger().info("System optimization completed")
+    logs.info("System optimization completed")
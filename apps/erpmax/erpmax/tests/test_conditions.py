@@ -0,0 +1,140 @@
+# ERPMAX Condition Compiler Tests
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import sqlite3
+import unittest
+
+from erpmax.conditions import Condition, UnsupportedCondition
+
+
+# Rows covering missing values on both sides of every comparison
+ROWS = [
+    {"name": "A", "qty": None, "limit": None, "status": None},
+    {"name": "B", "qty": 0, "limit": None, "status": "Open"},
+    {"name": "C", "qty": 5, "limit": 5, "status": "Closed"},
+    {"name": "D", "qty": 10, "limit": 3, "status": "Open"},
+    {"name": "E", "qty": None, "limit": 3, "status": "Draft"},
+    {"name": "F", "qty": -2, "limit": 0, "status": None}
+]
+
+
+class TestConditionSafety(unittest.TestCase):
+    def test_rejects_calls(self):
+        for expression in (
+            "__import__('os').system('true')",
+            "open('/etc/passwd')",
+            "doc.get('qty') > 0",
+            "len(doc.status) > 0",
+            "frappe.db.sql('DELETE FROM tabItem')"
+        ):
+            with self.assertRaises(UnsupportedCondition, msg=expression):
+                Condition(expression)
+
+    def test_rejects_attribute_and_dunder_access(self):
+        for expression in (
+            "doc.__class__ == 1",
+            "doc.__class__.__mro__ == 1",
+            "doc.status.__len__ == 1",
+            "().__class__.__bases__ == 1",
+            "frappe.session.user == 'Administrator'",
+            "context.__dict__ == 1"
+        ):
+            with self.assertRaises(UnsupportedCondition, msg=expression):
+                Condition(expression)
+
+    def test_rejects_other_expressions(self):
+        for expression in (
+            "doc.qty + 1 > 2",
+            "doc.items[0] == 1",
+            "[x for x in doc.items] == []",
+            "lambda: 1",
+            "doc.qty if doc.status else 1",
+            "doc.qty >"
+        ):
+            with self.assertRaises(UnsupportedCondition, msg=expression):
+                Condition(expression)
+
+    def test_dunder_fields_are_not_doc_fields(self):
+        # `doc.__class__` must not compile to a field lookup either
+        with self.assertRaises(UnsupportedCondition):
+            Condition("doc.__class__")
+
+
+class TestConditionEvaluation(unittest.TestCase):
+    def test_context_names(self):
+        condition = Condition("overdue_invoices > 0 and pending_quotations > 5")
+        self.assertTrue(condition.uses_context)
+        self.assertIsNone(condition.sql)
+        self.assertTrue(condition.predicate({}, {"overdue_invoices": 1, "pending_quotations": 6}))
+        self.assertFalse(condition.predicate({}, {"overdue_invoices": 1, "pending_quotations": 5}))
+        self.assertFalse(condition.predicate({}, {}))
+
+    def test_mismatched_types_do_not_match(self):
+        condition = Condition("doc.qty > 1")
+        self.assertEqual(condition.evaluate([{"qty": None}, {"qty": 2}, {"qty": "x"}]), [False, True, False])
+
+    def test_fields(self):
+        self.assertEqual(Condition("doc.qty < doc.limit or doc.status == 'Open'").fields, {"qty", "limit", "status"})
+
+
+class TestConditionNullSemantics(unittest.TestCase):
+    """The SQL translation selects exactly the rows the Python predicate matches"""
+
+    EXPRESSIONS = (
+        "doc.qty > 0",
+        "doc.qty <= 5",
+        "0 < doc.qty",
+        "doc.qty == 5",
+        "doc.qty != 5",
+        "doc.qty == None",
+        "doc.qty != None",
+        "doc.status in ('Open', 'Draft')",
+        "doc.status not in ('Open', 'Draft')",
+        "doc.qty < doc.limit",
+        "doc.qty == doc.limit",
+        "doc.qty != doc.limit",
+        "0 <= doc.qty < 10",
+        "doc.qty > 0 and doc.status != 'Closed'",
+        "doc.qty == None or doc.status == 'Open'",
+        "(doc.qty > 0 or doc.limit > 0) and doc.status not in ('Draft',)"
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        cls.connection = sqlite3.connect(":memory:")
+        cls.connection.execute("CREATE TABLE `tabTest` (name TEXT, qty INTEGER, `limit` INTEGER, status TEXT)")
+        cls.connection.executemany(
+            "INSERT INTO `tabTest` VALUES (:name, :qty, :limit, :status)", ROWS
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.close()
+
+    def select(self, condition):
+        # MariaDB's null-safe `<=>` is spelled `IS` in SQLite
+        sql = condition.sql.replace("<=>", "IS").replace("%s", "?")
+        return {
+            row[0] for row in
+            self.connection.execute(f"SELECT name FROM `tabTest` WHERE {sql}", condition.values)
+        }
+
+    def test_sql_matches_predicate(self):
+        for expression in self.EXPRESSIONS:
+            condition = Condition(expression)
+            self.assertIsNotNone(condition.sql, expression)
+
+            expected = {row["name"] for row in ROWS if condition.predicate(row)}
+            self.assertEqual(self.select(condition), expected, expression)
+
+    def test_null_never_satisfies_comparisons(self):
+        for expression in ("doc.qty > 0", "doc.qty <= 0", "doc.qty == 0", "doc.qty in (0, 5)"):
+            self.assertFalse(Condition(expression).predicate({"qty": None}), expression)
+
+    def test_null_satisfies_negations(self):
+        for expression in ("doc.qty != 0", "doc.qty not in (0, 5)"):
+            self.assertTrue(Condition(expression).predicate({"qty": None}), expression)
+
+    def test_not_has_no_sql(self):
+        # SQL `NOT` of a NULL comparison is NULL, not True, so it stays in Python
+        self.assertIsNone(Condition("not doc.qty > 0").sql)
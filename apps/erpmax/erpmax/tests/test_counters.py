@@ -0,0 +1,84 @@
+# ERPMAX Transaction Counter Tests
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import frappe
+from frappe.utils import getdate
+
+from erpmax import counters
+
+
+# A month no real document is dated in, so the site's counters are untouched
+TEST_DATE = getdate("2001-01-15")
+TEST_COMPANY = "_Test Counter Company"
+
+
+class TestCounterRoundTrip(unittest.TestCase):
+    """Counters written through pipelines read back through the public getters"""
+
+    def setUp(self):
+        self.keys = [
+            counters.get_day_key("Sales Invoice", TEST_DATE),
+            counters.get_month_key("Sales Invoice", TEST_DATE)
+        ]
+        self.clear()
+
+    def tearDown(self):
+        self.clear()
+
+    def clear(self):
+        frappe.local.erpmax_pending_counters = None
+        for key in self.keys:
+            frappe.cache().delete(key)
+
+    def make_invoice(self, grand_total):
+        return frappe._dict(
+            doctype="Sales Invoice", posting_date=TEST_DATE, company=TEST_COMPANY, grand_total=grand_total
+        )
+
+    def test_increments_read_back(self):
+        counters.update_counters(self.make_invoice(100.5), 1)
+        counters.update_counters(self.make_invoice(20), 1)
+        counters._apply_pending_counters()
+
+        self.assertEqual(counters.get_day_count("Sales Invoice", TEST_DATE), 2)
+        self.assertEqual(counters.get_month_count("Sales Invoice", TEST_DATE), 2)
+        self.assertAlmostEqual(counters.get_month_total("Sales Invoice", TEST_DATE), 120.5)
+
+    def test_cancel_reverses_submit(self):
+        counters.update_counters(self.make_invoice(50), 1)
+        counters._apply_pending_counters()
+        counters.update_counters(self.make_invoice(50), -1)
+        counters._apply_pending_counters()
+
+        self.assertEqual(counters.get_month_count("Sales Invoice", TEST_DATE), 0)
+        self.assertAlmostEqual(counters.get_month_total("Sales Invoice", TEST_DATE), 0)
+
+    def test_rollback_discards_increments(self):
+        counters.update_counters(self.make_invoice(50), 1)
+        counters._clear_pending_counters()
+        counters._apply_pending_counters()
+
+        self.assertEqual(counters.get_month_count("Sales Invoice", TEST_DATE), 0)
+
+    def test_overwrite_reports_drift_against_written_values(self):
+        counters.update_counters(self.make_invoice(10), 1)
+        counters._apply_pending_counters()
+
+        key = counters.get_month_key("Sales Invoice", TEST_DATE)
+        drift = counters._overwrite(key, {f"{TEST_COMPANY}:count": 1, f"{TEST_COMPANY}:total": 10.0})
+        self.assertEqual(drift, [])
+
+        drift = counters._overwrite(key, {f"{TEST_COMPANY}:count": 3, f"{TEST_COMPANY}:total": 10.0})
+        self.assertEqual([entry["field"] for entry in drift], [f"{TEST_COMPANY}:count"])
+        self.assertEqual(counters.get_month_count("Sales Invoice", TEST_DATE), 3)
+
+    def test_gauge_reads_reconciled_value(self):
+        key = frappe.cache().make_key(counters.GAUGES_KEY)
+        current = counters._overwrite(key, {})
+        try:
+            counters._overwrite(key, {"pending_quotations": 7})
+            self.assertEqual(counters.get_gauge("pending_quotations"), 7)
+        finally:
+            counters._overwrite(key, {entry["field"]: int(entry["counter"]) for entry in current})
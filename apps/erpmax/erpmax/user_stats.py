@@ -0,0 +1,117 @@
+# ERPMAX User Statistics
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import add_days, add_months, cint, get_first_day, getdate, nowdate
+
+
+# Doctypes counted in `documents_created`
+CREATION_DOCTYPES = ("Sales Order", "Customer", "Item", "Supplier")
+
+STAT_COLUMNS = ("documents_created", "logins")
+
+
+def on_after_insert(doc, method=None):
+    """Document event hook counting created documents and successful logins"""
+    if doc.doctype in CREATION_DOCTYPES:
+        increment_stat(doc.owner, getdate(doc.creation), "documents_created")
+
+    elif doc.doctype == "Activity Log" and doc.operation == "Login" and doc.status == "Success":
+        increment_stat(doc.user, getdate(doc.creation), "logins")
+
+
+def increment_stat(user, date, column, amount=1):
+    """Add `amount` to a user's daily counter"""
+    if column not in STAT_COLUMNS or not user:
+        return
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabERPMAX User Daily Stats` (`user`, `date`, `{column}`)
+        VALUES (%(user)s, %(date)s, %(amount)s)
+        ON DUPLICATE KEY UPDATE `{column}` = `{column}` + %(amount)s
+    """, {"user": user, "date": date, "amount": amount})
+
+
+def get_documents_created(user, date=None):
+    """Get the number of documents a user created on a day"""
+    rows = frappe.db.sql("""
+        SELECT documents_created
+        FROM `tabERPMAX User Daily Stats`
+        WHERE user = %s AND date = %s
+    """, [user, getdate(date or nowdate())])
+
+    return cint(rows[0][0]) if rows else 0
+
+
+def get_login_count(user, from_date, to_date=None):
+    """Get a user's successful logins between two dates (inclusive)"""
+    return cint(frappe.db.sql("""
+        SELECT SUM(logins)
+        FROM `tabERPMAX User Daily Stats`
+        WHERE user = %s AND date BETWEEN %s AND %s
+    """, [user, getdate(from_date), getdate(to_date or nowdate())])[0][0])
+
+
+def rebuild_user_daily_stats(from_date, to_date=None):
+    """Rebuild the daily counters of every user for a date range
+
+    Source rows are selected with `creation >= start AND creation < end`
+    range predicates so the creation indexes can be used, one month at a
+    time to keep each transaction small. Returns the rows written.
+    """
+    from_date = getdate(from_date)
+    to_date = getdate(to_date or nowdate())
+    written = 0
+
+    window_start = from_date
+    while window_start <= to_date:
+        window_end = min(add_days(get_first_day(add_months(window_start, 1)), -1), to_date)
+        written += _rebuild_window(window_start, window_end)
+        frappe.db.commit()
+
+        window_start = add_days(window_end, 1)
+
+    return written
+
+
+def _rebuild_window(from_date, to_date):
+    values = {"from": from_date, "to": add_days(to_date, 1)}
+    stats = {}
+
+    for doctype in CREATION_DOCTYPES:
+        rows = frappe.db.sql(f"""
+            SELECT owner, DATE(creation), COUNT(*)
+            FROM `tab{doctype}`
+            WHERE creation >= %(from)s AND creation < %(to)s
+            GROUP BY owner, DATE(creation)
+        """, values)
+
+        for user, date, count in rows:
+            stats.setdefault((user, date), [0, 0])[0] += count
+
+    rows = frappe.db.sql("""
+        SELECT user, DATE(creation), COUNT(*)
+        FROM `tabActivity Log`
+        WHERE creation >= %(from)s AND creation < %(to)s
+        AND operation = 'Login'
+        AND status = 'Success'
+        GROUP BY user, DATE(creation)
+    """, values)
+
+    for user, date, count in rows:
+        stats.setdefault((user, date), [0, 0])[1] += count
+
+    frappe.db.sql("""
+        DELETE FROM `tabERPMAX User Daily Stats`
+        WHERE date BETWEEN %s AND %s
+    """, [from_date, to_date])
+
+    items = [(user, date, created, logins) for (user, date), (created, logins) in stats.items() if user]
+    for start in range(0, len(items), 1000):
+        batch = items[start:start + 1000]
+        frappe.db.sql(f"""
+            INSERT INTO `tabERPMAX User Daily Stats` (`user`, `date`, `documents_created`, `logins`)
+            VALUES {", ".join(["(%s, %s, %s, %s)"] * len(batch))}
+        """, [value for row in batch for value in row])
+
+    return len(items)
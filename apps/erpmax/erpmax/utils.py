@@ -0,0 +1,55 @@
+# ERPMAX Utility Functions
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import frappe
+import redis
+
+
+DEFAULT_BULK_UPDATE_BATCH_SIZE = 500
+
+
+def bulk_update_column(doctype, fieldname, values, batch_size=DEFAULT_BULK_UPDATE_BATCH_SIZE):
+    """Write `{name: value}` pairs into one column with batched multi-row UPDATEs
+
+    Each batch is a single `UPDATE ... SET col = CASE name WHEN .. THEN .. END`
+    statement, so a batch of 500 rows costs one round trip instead of 500.
+    `modified` is left untouched as the values written here are derived data.
+    Returns the number of rows written.
+    """
+    if not values:
+        return 0
+
+    table = f"tab{doctype}"
+    items = list(values.items())
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+
+        params = []
+        for name, value in batch:
+            params.extend([name, value])
+        params.extend(name for name, _value in batch)
+
+        frappe.db.sql(f"""
+            UPDATE `{table}`
+            SET `{fieldname}` = CASE name {" ".join(["WHEN %s THEN %s"] * len(batch))} END
+            WHERE name IN ({", ".join(["%s"] * len(batch))})
+        """, params)
+
+    return len(items)
+
+
+def get_affected_rows():
+    """Get the number of rows changed by the last statement"""
+    cursor = getattr(frappe.db, "_cursor", None)
+    return max(cursor.rowcount, 0) if cursor else 0
+
+
+def read_raw(command, key, *args):
+    """Run a Redis read command on a key already prefixed with `make_key`
+
+    Hashes and sets written through pipelines or with `hincrby` hold plain
+    values under the single-prefixed key. frappe's RedisWrapper methods of
+    the same names prefix again and unpickle, so they must not read them.
+    """
+    return getattr(redis.Redis, command)(frappe.cache(), key, *args)
@@ -102,11 +102,61 @@ company_transaction_deletion_doctypes = []
 # Request Events
 doc_events = {
     "*": {
-        "on_update": "erpmax.api.clear_cache",
-        "after_insert": "erpmax.api.log_creation"
+        "on_update": [
+            "erpmax.cache.on_doc_change",
+            "erpmax.activity.record_activity"
+        ],
+        "on_update_after_submit": "erpmax.cache.on_doc_change",
+        "on_cancel": "erpmax.cache.on_doc_change",
+        "on_trash": [
+            "erpmax.cache.on_doc_change",
+            "erpmax.activity.remove_activity"
+        ],
+        "after_insert": [
+            "erpmax.api.log_creation",
+            "erpmax.user_stats.on_after_insert"
+        ]
+    },
+    "User": {
+        "on_update": ["erpmax.roles.on_user_change", "erpmax.auth.on_user_change"],
+        "on_trash": ["erpmax.roles.on_user_change", "erpmax.auth.on_user_change"]
+    },
+    "Sales Order": {
+        "on_submit": "erpmax.counters.on_submit",
+        "on_cancel": "erpmax.counters.on_cancel",
+        "on_update_after_submit": "erpmax.counters.on_update_after_submit"
+    },
+    "Sales Invoice": {
+        "on_submit": ["erpmax.counters.on_submit", "erpmax.rollups.on_submit"],
+        "on_cancel": ["erpmax.counters.on_cancel", "erpmax.rollups.on_cancel"],
+        "on_update_after_submit": "erpmax.counters.on_update_after_submit"
+    },
+    "Purchase Order": {
+        "on_submit": "erpmax.counters.on_submit",
+        "on_cancel": "erpmax.counters.on_cancel",
+        "on_update_after_submit": "erpmax.counters.on_update_after_submit"
+    },
+    "Purchase Invoice": {
+        "on_submit": "erpmax.counters.on_submit",
+        "on_cancel": "erpmax.counters.on_cancel",
+        "on_update_after_submit": "erpmax.counters.on_update_after_submit"
+    },
+    "Stock Ledger Entry": {
+        "on_submit": "erpmax.stock_index.on_stock_ledger_entry"
+    },
+    "Bin": {
+        "on_update": "erpmax.stock_index.on_bin_change"
+    },
+    "Item": {
+        "on_update": "erpmax.stock_index.on_item_change"
     }
 }
 
+# Background Jobs
+after_job = [
+    "erpmax.logs.flush"
+]
+
 # Scheduled Tasks
 scheduler_events = {
     "all": [
@@ -150,6 +200,7 @@ website_generators = ["Item", "BOM", "Customer", "Supplier"]
 
 # Installation
 after_install = "erpmax.install.after_install"
+after_migrate = ["erpmax.install.after_migrate"]
 before_uninstall = "erpmax.uninstall.before_uninstall"
 
 # Desk Notifications